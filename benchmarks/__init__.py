@@ -0,0 +1,21 @@
+"""Offline benchmarks for the iKuai integration.
+
+Run from the repository root, e.g. ``python -m benchmarks.bench_decode`` or
+``python -m benchmarks.bench_poll_cycle``.  ``python -m benchmarks.fake_ikuai``
+serves a stand-in router that Home Assistant itself can also be pointed at.
+
+The integration modules are loaded as the ``ikuai`` package straight from
+``custom_components/ikuai`` without executing its ``__init__`` (which needs a
+Home Assistant install), so the HTTP/parsing layer can be measured with only
+aiohttp and async_timeout available.
+"""
+import sys
+import types
+from pathlib import Path
+
+COMPONENT_DIR = Path(__file__).resolve().parent.parent / "custom_components" / "ikuai"
+
+if "ikuai" not in sys.modules:
+    _package = types.ModuleType("ikuai")
+    _package.__path__ = [str(COMPONENT_DIR)]
+    sys.modules["ikuai"] = _package
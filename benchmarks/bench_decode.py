@@ -0,0 +1,73 @@
+"""Compare the old multi-decode/double-parse path with decode_response.
+
+    python -m benchmarks.bench_decode [--hosts 2000] [--number 20] [FILE ...]
+
+Each FILE is a raw response body (e.g. extracted from a capture); without
+files synthetic monitor_lanip payloads in UTF-8 and GBK are used.
+"""
+import argparse
+import json
+import timeit
+
+from . import payloads
+from ikuai import data_fetcher
+from ikuai.data_fetcher import decode_response
+
+
+def old_decode(content):
+    """The pre-optimisation requestpost_json body, kept verbatim for reference."""
+    text = None
+    for encoding in ['utf-8', 'gbk', 'gb18030', 'latin-1']:
+        try:
+            text = content.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    if text is None:
+        text = content.decode('utf-8', errors='ignore')
+
+    try:
+        json.loads(text)
+        is_json = True
+    except (ValueError, TypeError):
+        is_json = False
+    if is_json:
+        return json.loads(text)
+    return text
+
+
+def new_decode(content, charset):
+    return decode_response(content, charset)[0]
+
+
+def run(name, content, number):
+    # 先解一次拿到"记住的"字符集，模拟稳定运行时的状态
+    charset = decode_response(content)[1]
+    assert old_decode(content) == new_decode(content, charset), name
+    old = min(timeit.repeat(lambda: old_decode(content), number=number, repeat=3)) / number
+    new = min(timeit.repeat(lambda: new_decode(content, charset), number=number, repeat=3)) / number
+    print(f"{name:<32} {len(content) / 1024:>9.1f} KiB  old {old * 1000:>8.2f} ms  "
+          f"new {new * 1000:>8.2f} ms  x{old / new:>5.1f}  ({charset})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=2000)
+    parser.add_argument("--number", type=int, default=20)
+    parser.add_argument("files", nargs="*")
+    args = parser.parse_args()
+
+    print(f"orjson: {'yes' if data_fetcher.orjson is not None else 'no'}")
+    if args.files:
+        for path in args.files:
+            with open(path, "rb") as file:
+                run(path, file.read(), args.number)
+        return
+
+    payload = payloads.lan_hosts_payload(args.hosts)
+    run(f"monitor_lanip {args.hosts} utf-8", payloads.encode(payload, "utf-8"), args.number)
+    run(f"monitor_lanip {args.hosts} gbk", payloads.encode(payload, "gbk"), args.number)
+
+
+if __name__ == "__main__":
+    main()
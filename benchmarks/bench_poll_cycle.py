@@ -0,0 +1,114 @@
+"""Measure full DataFetcher.get_data cycles against the fake iKuai router.
+
+    python -m benchmarks.bench_poll_cycle [--sizes 100 2000 10000] [--cycles 5] [--latency 0.02]
+
+For every LAN host count a fake router (``benchmarks.fake_ikuai``) is
+started in a child process, so its CPU and memory do not count, and
+``get_data`` is run with every section due.  Reported per cycle: wall time,
+CPU time of this process (i.e. the event loop doing the polling), calls
+sent, bytes received and cycles that returned no data; peak traced memory is measured in a separate
+pass because tracemalloc slows everything down.
+"""
+import argparse
+import asyncio
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from . import fake_ikuai, payloads
+from ikuai.data_fetcher import DataFetcher
+
+
+def tracker_config(count, hosts):
+    """Return a UI-style tracker config for ``count`` of the fake router's hosts (plus one absent)."""
+    config = {}
+    for index in range(0, hosts, max(1, hosts // max(count, 1)))[:count]:
+        host = payloads.lan_host(index)
+        config[host["mac"]] = {"name": host["hostname"], "type": "mac", "buffer": 0}
+    config["02:00:00:00:00:01"] = {"name": "absent", "type": "mac", "buffer": 0}
+    return config
+
+
+def start_router(args, hosts):
+    """Start the fake router in a child process and return (process, url)."""
+    command = [sys.executable, "-m", "benchmarks.fake_ikuai", "--port", "0", "--hosts", str(hosts),
+               "--mac-rules", str(args.mac_rules), "--latency", str(args.latency),
+               "--failure-rate", str(args.failure_rate), "--charset", args.charset]
+    if args.new_format:
+        command.append("--new-format")
+    if args.page_cap:
+        command += ["--page-cap", str(args.page_cap)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True, cwd=Path(__file__).resolve().parent.parent)
+    url = process.stdout.readline().strip()
+    if not url:
+        process.kill()
+        raise RuntimeError("fake router did not start")
+    return process, url
+
+
+async def run_cycles(url, trackers, cycles, trace_memory):
+    passwd, pas = fake_ikuai.credentials("admin")
+    fetcher = DataFetcher(None, url, "admin", passwd, pas, trackers)
+    samples = []
+    try:
+        sess_key = await fetcher._login_ikuai()
+        if not sess_key:
+            raise RuntimeError("login to the fake router failed")
+        for _ in range(cycles):
+            # 每轮都抓取全部 section，测量最重的一轮
+            fetcher.expire_sections()
+            requests = sum(stats.requests for stats in fetcher.metrics.endpoints.values())
+            received = sum(stats.bytes_total for stats in fetcher.metrics.endpoints.values())
+            if trace_memory:
+                tracemalloc.reset_peak()
+            wall, cpu = time.perf_counter(), time.process_time()
+            data = await fetcher.get_data(sess_key)
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            samples.append({
+                "ok": isinstance(data, dict),
+                "wall": wall,
+                "cpu": cpu,
+                "peak": tracemalloc.get_traced_memory()[1] if trace_memory else 0,
+                "requests": sum(stats.requests for stats in fetcher.metrics.endpoints.values()) - requests,
+                "bytes": sum(stats.bytes_total for stats in fetcher.metrics.endpoints.values()) - received,
+                "trackers": len(data["tracker"]) if isinstance(data, dict) else 0,
+            })
+    finally:
+        await fetcher.async_close()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 2000, 10000], help="LAN host counts")
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--trackers", type=int, default=20, help="configured device trackers")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    fake_ikuai.add_arguments(parser)
+    args = parser.parse_args()
+
+    print(f"{'hosts':>6} {'wall ms':>9} {'cpu ms':>9} {'peak MiB':>9} {'calls':>6} {'KiB':>8} {'home':>5} {'failed':>6}")
+    for hosts in args.sizes:
+        process, url = start_router(args, hosts)
+        try:
+            trackers = tracker_config(args.trackers, hosts)
+            samples = asyncio.run(run_cycles(url, trackers, args.cycles, False))
+            peak = 0
+            if not args.no_memory:
+                tracemalloc.start()
+                peak = max(sample["peak"] for sample in asyncio.run(run_cycles(url, trackers, 2, True)))
+                tracemalloc.stop()
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"{hosts:>6} {statistics.median(s['wall'] for s in samples) * 1000:>9.1f} "
+              f"{statistics.median(s['cpu'] for s in samples) * 1000:>9.1f} {peak / 1024 / 1024:>9.2f} "
+              f"{samples[-1]['requests']:>6} {samples[-1]['bytes'] / 1024:>8.1f} {samples[-1]['trackers']:>5} "
+              f"{sum(not s['ok'] for s in samples):>6}")
+
+
+if __name__ == "__main__":
+    main()
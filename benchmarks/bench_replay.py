@@ -0,0 +1,87 @@
+"""Replay a response capture through DataFetcher.get_data and time it.
+
+    python -m benchmarks.bench_replay CAPTURE [--cycles 5] [--speed 1] [--profile] [--track MAC ...]
+    python -m benchmarks.bench_replay --record CAPTURE [--hosts 3000 --charset gbk ...]
+
+CAPTURE is a file written by the integration's "record router responses"
+option (``<config>/ikuai_capture_<host>.jsonl.gz``).  Responses are served
+with their recorded latency divided by ``--speed`` (0 = no delay), so real
+payload shapes can be profiled without the router.  ``--record`` writes a
+capture from the fake router instead, for trying this out.
+"""
+import argparse
+import asyncio
+import cProfile
+import pstats
+import statistics
+import time
+
+from . import fake_ikuai
+from ikuai.capture import ReplaySession
+from ikuai.data_fetcher import DataFetcher
+
+
+async def record(path, args):
+    router = fake_ikuai.from_arguments(args)
+    url = await router.start()
+    passwd, pas = fake_ikuai.credentials("admin")
+    fetcher = DataFetcher(None, url, "admin", passwd, pas, {})
+    fetcher.enable_capture(path)
+    try:
+        sess_key = await fetcher._login_ikuai()
+        for _ in range(args.cycles):
+            fetcher.expire_sections()
+            await fetcher.get_data(sess_key)
+    finally:
+        await fetcher.async_close()
+        await router.stop()
+    print(f"recorded {fetcher._capture.records} exchanges to {path}")
+
+
+async def replay(path, args, profiler):
+    fetcher = DataFetcher(None, "http://replay", "admin", "", "", {mac: {"type": "mac"} for mac in args.track})
+    session = ReplaySession.from_file(path, args.speed)
+    fetcher.use_transport(session)
+    sess_key = await fetcher._login_ikuai() or "replay"
+    samples = []
+    for _ in range(args.cycles):
+        fetcher.expire_sections()
+        if profiler:
+            profiler.enable()
+        wall, cpu = time.perf_counter(), time.process_time()
+        data = await fetcher.get_data(sess_key)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        if profiler:
+            profiler.disable()
+        samples.append((wall, cpu, isinstance(data, dict)))
+    await fetcher.async_close()
+    print(f"cycles {len(samples)}, failed {sum(not ok for _, _, ok in samples)}, unmatched requests {session.misses}")
+    print(f"wall median {statistics.median(s[0] for s in samples) * 1000:.1f} ms, "
+          f"cpu median {statistics.median(s[1] for s in samples) * 1000:.1f} ms")
+    for endpoint, stats in fetcher.metrics.as_dict().items():
+        print(f"  {endpoint:<44} {stats['requests']:>5} calls {stats['bytes_total'] / 1024:>9.1f} KiB "
+              f"decode {stats['decode_avg_ms']:>7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture")
+    parser.add_argument("--record", action="store_true", help="write CAPTURE from the fake router")
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed-up, 0 for no delay")
+    parser.add_argument("--profile", action="store_true", help="print the top cProfile entries")
+    parser.add_argument("--track", action="append", default=[], help="MAC to resolve as a tracker")
+    fake_ikuai.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.record:
+        asyncio.run(record(args.capture, args))
+        return
+    profiler = cProfile.Profile() if args.profile else None
+    asyncio.run(replay(args.capture, args, profiler))
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Compare the setup-blocking first refresh: full fetch vs. bootstrap.
+
+    python -m benchmarks.bench_startup [--sizes 100 2000 10000] [--routers 3] [--latency 0.02]
+
+Measures, for ``--routers`` routers set up concurrently (as HA does at
+startup), the time from the login until the first refresh has returned,
+i.e. until the platforms can be forwarded.  ``full`` is the old behaviour
+(every section on the first refresh), ``bootstrap`` fetches only
+homepage/sysstat; ``deferred`` is the background full fetch that follows.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from . import fake_ikuai
+from .bench_poll_cycle import start_router, tracker_config
+from ikuai.data_fetcher import DataFetcher
+
+
+async def setup_router(url, trackers, bootstrap):
+    """Return (seconds until platforms could be set up, seconds of the deferred full fetch)."""
+    passwd, pas = fake_ikuai.credentials("admin")
+    fetcher = DataFetcher(None, url, "admin", passwd, pas, trackers)
+    try:
+        started = time.perf_counter()
+        sess_key = await fetcher._login_ikuai()
+        data = await fetcher.get_data(sess_key, bootstrap)
+        ready = time.perf_counter() - started
+        if not isinstance(data, dict):
+            raise RuntimeError(f"get_data returned {data!r}")
+        deferred = 0.0
+        if bootstrap:
+            started = time.perf_counter()
+            await fetcher.get_data(sess_key)
+            deferred = time.perf_counter() - started
+        return ready, deferred
+    finally:
+        await fetcher.async_close()
+
+
+async def run(urls, trackers, bootstrap):
+    return await asyncio.gather(*[setup_router(url, trackers, bootstrap) for url in urls])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 2000, 10000], help="LAN host counts")
+    parser.add_argument("--routers", type=int, default=3, help="routers set up concurrently")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--trackers", type=int, default=20, help="configured device trackers")
+    fake_ikuai.add_arguments(parser)
+    parser.set_defaults(latency=0.02)
+    args = parser.parse_args()
+
+    print(f"{'hosts':>6} {'full ms':>9} {'bootstrap ms':>13} {'deferred ms':>12}")
+    for hosts in args.sizes:
+        routers = [start_router(args, hosts) for _ in range(args.routers)]
+        try:
+            urls = [url for _, url in routers]
+            trackers = tracker_config(args.trackers, hosts)
+            full, ready, deferred = [], [], []
+            for _ in range(args.repeat):
+                # 所有路由器都就绪才算 HA 启动完成，取最慢的一个
+                full.append(max(r for r, _ in asyncio.run(run(urls, trackers, False))))
+                results = asyncio.run(run(urls, trackers, True))
+                ready.append(max(r for r, _ in results))
+                deferred.append(max(d for _, d in results))
+        finally:
+            for process, _ in routers:
+                process.terminate()
+                process.wait()
+        print(f"{hosts:>6} {statistics.median(full) * 1000:>9.1f} {statistics.median(ready) * 1000:>13.1f} "
+              f"{statistics.median(deferred) * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
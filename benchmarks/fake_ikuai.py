@@ -0,0 +1,298 @@
+"""A local stand-in for an iKuai router, serving /Action/login and /Action/call.
+
+    python -m benchmarks.fake_ikuai [--port 8080] [--hosts 2000] [--new-format] ...
+
+Answers every request the integration sends (homepage, lan, wan, ipv6,
+acl_mac, monitor_lanip, switch show/seting and the button actions) in the
+old (``Result: 30000``/``Data``) or new (``code: 0``/``results``) format.
+Host and rule counts, per-request latency, the router's page size cap,
+the response charset and injected failures are configurable, so the
+integration can be exercised and measured without a router.
+"""
+import argparse
+import asyncio
+import base64
+import random
+import secrets
+import time
+from hashlib import md5
+
+from aiohttp import web
+
+from . import payloads
+
+# 与真实路由器一致的错误码
+RESULT_SUCCESS = 30000
+RESULT_LOGIN_OK = 10000
+RESULT_BAD_AUTH = 10001
+RESULT_NO_SESSION = 10014
+
+
+def credentials(password):
+    """Return the (passwd, pas) pair the integration derives from a password."""
+    return md5(password.encode("utf-8")).hexdigest(), base64.b64encode(f"salt_11{password}".encode()).decode()
+
+
+class FakeIkuai:
+    """In-process fake router.
+
+    ``latency`` (seconds, plus up to ``jitter``) is added to every call,
+    ``failure_rate`` is the share of calls answered with HTTP 500 and
+    ``fail_funcs`` makes every call to the listed func_names fail that way.
+    ``page_cap`` limits how many rows one ``limit`` page returns, like
+    firmware that ignores larger page sizes.
+    """
+
+    def __init__(self, hosts=100, mac_rules=20, new_format=False, latency=0.0, jitter=0.0,
+                 failure_rate=0.0, fail_funcs=(), page_cap=None, charset="utf-8",
+                 username="admin", password="admin", seed=0):
+        """Initialize the router state."""
+        self.new_format = new_format
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.fail_funcs = set(fail_funcs)
+        self.page_cap = page_cap
+        self.charset = charset
+        self.username = username
+        self.passwd, self.pas = credentials(password)
+        self._random = random.Random(seed)
+        random.seed(seed)
+        self.hosts = [payloads.lan_host(index) for index in range(hosts)]
+        self.mac_rules = [
+            {
+                "id": index + 1,
+                "mac": self.hosts[index % max(hosts, 1)]["mac"] if hosts else f"00:00:00:00:00:{index:02x}",
+                "comment": f"规则{index + 1}",
+                "enabled": "yes" if index % 2 else "no",
+                "time": "00:00-23:59",
+                "week": "1234567",
+            }
+            for index in range(mac_rules)
+        ]
+        self.options = {"arp_filter": 0, "stream_ctl_mode": 0}
+        self.sessions = set()
+        self.calls = []
+        self.logins = 0
+        self.started = time.time()
+        self._runner = None
+
+    # 请求处理
+
+    def expire_sessions(self):
+        """Drop every session so the next call answers 10014."""
+        self.sessions.clear()
+
+    def _respond(self, payload, cookies=None):
+        response = web.Response(
+            body=payloads.encode(payload, self.charset),
+            content_type="application/json",
+            charset=self.charset,
+        )
+        for name, value in (cookies or {}).items():
+            response.set_cookie(name, value)
+        return response
+
+    def _result(self, code, message):
+        if self.new_format:
+            return {"code": 0 if code == RESULT_SUCCESS else code, "message": message}
+        return {"Result": code, "ErrMsg": message}
+
+    async def _delay(self):
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def handle_login(self, request):
+        """POST /Action/login."""
+        body = await request.json()
+        await self._delay()
+        self.logins += 1
+        if body.get("username") != self.username or body.get("passwd") != self.passwd:
+            return self._respond({"Result": RESULT_BAD_AUTH, "ErrMsg": "Username or password error"})
+        sess_key = secrets.token_hex(16)
+        self.sessions.add(sess_key)
+        return self._respond({"Result": RESULT_LOGIN_OK, "ErrMsg": "Success"}, {"sess_key": sess_key})
+
+    async def handle_call(self, request):
+        """POST /Action/call."""
+        body = await request.json()
+        self.calls.append(body)
+        await self._delay()
+        func_name = body.get("func_name")
+        if func_name in self.fail_funcs or self._random.random() < self.failure_rate:
+            raise web.HTTPInternalServerError()
+        if request.cookies.get("sess_key") not in self.sessions:
+            return self._respond({"Result": RESULT_NO_SESSION, "ErrMsg": "no login authentication"})
+
+        param = body.get("param") or {}
+        if body.get("action") != "show":
+            return self._respond(self._action(func_name, body.get("action"), param))
+        handler = getattr(self, f"_show_{func_name}", None)
+        if handler is None:
+            return self._respond(self._result(RESULT_SUCCESS, "Success"))
+        types = [item.strip() for item in str(param.get("TYPE", "")).split(",") if item.strip()]
+        return self._respond(payloads.wrap(handler(types, param), self.new_format))
+
+    def _action(self, func_name, action, param):
+        if func_name == "acl_mac" and action in ("up", "down"):
+            ids = {str(item) for item in str(param.get("id", "")).split(",")}
+            for rule in self.mac_rules:
+                if str(rule["id"]) in ids:
+                    rule["enabled"] = "yes" if action == "up" else "no"
+        elif action == "seting":
+            self.options.update({k: v for k, v in param.items() if k in self.options})
+        return self._result(RESULT_SUCCESS, "Success")
+
+    def _page(self, rows, param):
+        """Apply a ``limit: offset,count`` param the way the router does."""
+        if "limit" not in param:
+            return rows
+        offset, count = (int(item) for item in str(param["limit"]).split(","))
+        if self.page_cap:
+            count = min(count, self.page_cap)
+        return rows[offset:offset + count]
+
+    # 各 func_name 的 show 数据
+
+    def _show_homepage(self, types, param):
+        block = {}
+        if "sysstat" in types:
+            upload = sum(host["upload"] for host in self.hosts)
+            download = sum(host["download"] for host in self.hosts)
+            block["sysstat"] = {
+                "hostname": "iKuai-Fake",
+                "uptime": int(time.time() - self.started),
+                "verinfo": {"verstring": "3.7.0 x64 Build202401010000", "version": "3.7.0"},
+                "cpu": [f"{self._random.randint(1, 30)}%"],
+                "cputemp": [self._random.randint(40, 60)],
+                "memory": {"total": 4096000, "available": 3000000, "free": 2500000,
+                           "cached": 400000, "buffers": 100000, "used": "27%"},
+                "online_user": {"count": len(self.hosts), "count_2g": 0, "count_5g": 0,
+                                "count_wired": len(self.hosts), "count_wireless": 0},
+                "stream": {"connect_num": sum(host["connect_num"] for host in self.hosts),
+                           "upload": upload, "download": download,
+                           "total_up": upload * 1000, "total_down": download * 1000},
+            }
+        if "ac_status" in types:
+            block["ac_status"] = {"ap_count": 2, "ap_online": 2}
+        return block
+
+    def _show_lan(self, types, param):
+        block = {}
+        if "ether_info" in types:
+            block["ether_info"] = {"lan1": {"ip_addr": "192.168.1.1", "netmask": "255.255.255.0"}}
+        if "snapshoot" in types:
+            block["snapshoot_wan"] = [
+                {"id": 1, "interface": "wan1", "internet": 2, "default_route": 1,
+                 "ip_addr": "203.0.113.10", "gateway": "203.0.113.1", "updatetime": int(self.started)},
+                {"id": 2, "interface": "wan2", "internet": 3, "default_route": 0,
+                 "ip_addr": "", "gateway": "", "updatetime": 0},
+            ]
+            block["snapshoot_lan"] = [{"id": 1, "interface": "lan1", "ip_addr": "192.168.1.1"}]
+        return block
+
+    def _show_wan(self, types, param):
+        vlans = [{"id": 1, "vlan_name": "vwan1", "default_route": 0,
+                  "pppoe_ip_addr": "198.51.100.20", "pppoe_updatetime": int(self.started)}]
+        return {"vlan_data": self._page(vlans, param), "vlan_total": len(vlans)}
+
+    def _show_ipv6(self, types, param):
+        block = {}
+        if "data" in types:
+            block["data"] = [{"id": 1, "interface": "wan1", "dhcp6_ip_addr": "2001:db8::10"}]
+        if "total" in types:
+            block["total"] = 1
+        if "lan_data" in types:
+            block["lan_data"] = [{"id": 1, "interface": "lan1", "ipv6_addr": "2001:db8:1::1/64"}]
+        if "lan_total" in types:
+            block["lan_total"] = 1
+        return block
+
+    def _show_acl_mac(self, types, param):
+        return {"total": len(self.mac_rules), "data": self._page(self.mac_rules, param)}
+
+    def _show_monitor_lanip(self, types, param):
+        rows = self._page(self.hosts, param)
+        for host in rows:
+            # 实时计数每次查询都在变化
+            host["upload"] = self._random.randint(0, 10**7)
+            host["download"] = self._random.randint(0, 10**8)
+        return {"total": len(self.hosts), "data": rows}
+
+    def _show_arp(self, types, param):
+        return {"arp_filter": self.options["arp_filter"]}
+
+    def _show_stream_control(self, types, param):
+        return {"stream_ctl_mode": self.options["stream_ctl_mode"]}
+
+    # 服务器生命周期
+
+    def make_app(self):
+        """Return the aiohttp application."""
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_post("/Action/login", self.handle_login)
+        app.router.add_post("/Action/call", self.handle_call)
+        return app
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start serving and return the base URL."""
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        """Stop serving."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def add_arguments(parser):
+    """Register the fake router options on an argument parser."""
+    parser.add_argument("--hosts", type=int, default=100, help="LAN hosts in monitor_lanip")
+    parser.add_argument("--mac-rules", type=int, default=20, help="rules in acl_mac")
+    parser.add_argument("--new-format", action="store_true", help="answer with code/results")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency, seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of calls answered with HTTP 500")
+    parser.add_argument("--fail-func", action="append", default=[], help="func_name that always fails")
+    parser.add_argument("--page-cap", type=int, default=None, help="max rows per limit page")
+    parser.add_argument("--charset", default="utf-8", help="response charset, e.g. gbk")
+
+
+def from_arguments(args):
+    """Build a FakeIkuai from parsed ``add_arguments`` options."""
+    return FakeIkuai(
+        hosts=args.hosts, mac_rules=args.mac_rules, new_format=args.new_format,
+        latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate,
+        fail_funcs=args.fail_func, page_cap=args.page_cap, charset=args.charset,
+    )
+
+
+async def serve(router, port):
+    url = await router.start("127.0.0.1", port)
+    # 基准脚本从标准输出读取地址
+    print(url, flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await router.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8080)
+    add_arguments(parser)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(from_arguments(args), args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
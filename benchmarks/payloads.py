@@ -0,0 +1,48 @@
+"""Synthetic iKuai response payloads shaped like real router answers."""
+import json
+import random
+
+
+def lan_host(index, comment=None):
+    """Return one monitor_lanip host record."""
+    ip = f"10.{index // 64000 % 256}.{index // 250 % 256}.{index % 250 + 1}"
+    mac = ":".join(f"{(index >> shift) & 0xff:02x}" for shift in (40, 32, 24, 16, 8, 0))
+    return {
+        "id": index + 1,
+        "ip_addr": ip,
+        "ip_addr_int": index,
+        "mac": mac,
+        "hostname": f"host-{index}",
+        "comment": comment if comment is not None else f"设备{index}",
+        "client_type": "pc",
+        "uptime": random.randint(0, 864000),
+        "connect_num": random.randint(0, 500),
+        "upload": random.randint(0, 10**7),
+        "download": random.randint(0, 10**8),
+        "total_up": random.randint(0, 10**11),
+        "total_down": random.randint(0, 10**12),
+        "apname": "",
+        "ssid": "",
+        "signal": "",
+        "frequencies": "",
+        "auth_type": 0,
+        "timestamp": 0,
+    }
+
+
+def wrap(block, new_format=False):
+    """Wrap a data block in the old (Result/Data) or new (code/results) envelope."""
+    if new_format:
+        return {"code": 0, "message": "Success", "results": block}
+    return {"Result": 30000, "ErrMsg": "Success", "Data": block}
+
+
+def lan_hosts_payload(hosts, total=None, new_format=False, offset=0):
+    """Return a monitor_lanip response dict holding ``hosts`` records."""
+    data = [lan_host(offset + i) for i in range(hosts)]
+    return wrap({"data": data, "total": total if total is not None else hosts}, new_format)
+
+
+def encode(payload, charset="utf-8"):
+    """Serialise a payload the way the router does (compact, non-ASCII kept)."""
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode(charset)
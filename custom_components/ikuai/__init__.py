@@ -2,11 +2,14 @@
 from __future__ import annotations
 from async_timeout import timeout
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.const import Platform, EVENT_HOMEASSISTANT_CLOSE, EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import HomeAssistant, ServiceCall, callback
 from homeassistant.core_config import Config
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-from .data_fetcher import DataFetcher
+from homeassistant.helpers.storage import Store
+from .data_fetcher import DataFetcher, action_succeeded
+from .polling import AdaptiveInterval
+from .session import SessionManager, async_remove_session
 from .const import (
     DOMAIN,
     CONF_USERNAME,
@@ -14,16 +17,42 @@ from .const import (
     CONF_PASS,
     CONF_HOST,    
     CONF_UPDATE_INTERVAL,
+    CONF_HOSTS_UPDATE_INTERVAL,
+    CONF_SLOW_UPDATE_INTERVAL,
+    CONF_WARM_UP,
+    CONF_CAPTURE,
+    CONF_ACT_BUFFER,
+    CONF_CONSIDER_HOME,
+    CONF_ADAPTIVE_POLLING,
+    CONF_ADAPTIVE_MIN_INTERVAL,
+    CONF_ADAPTIVE_MAX_INTERVAL,
+    MIN_UPDATE_INTERVAL,
+    DEFAULT_ADAPTIVE_MAX_INTERVAL,
+    EVENT_PRESENCE_CHANGED,
+    DEFAULT_HOSTS_UPDATE_INTERVAL,
+    DEFAULT_SLOW_UPDATE_INTERVAL,
+    HOSTS_SECTIONS,
+    SLOW_SECTIONS,
     COORDINATOR,
     UNDO_UPDATE_LISTENER,
     CONF_TRACKER_CONFIG,
     CONF_SOURCE_MODE, 
     MODE_CONST,
     CONF_CUSTOM_SWITCHES,
+    KEYED_DATA,
+    SNAPSHOT_STORAGE_VERSION,
+    SNAPSHOT_SAVE_INTERVAL,
+    SNAPSHOT_SKIP_KEYS,
+    LAN_SNAPSHOT_TTL,
+    SECTION_SWITCH,
+    SECTION_MAC_CONTROL,
+    SERVICE_SET_MAC_CONTROL,
+    MAC_CONTROL_BATCH_SIZE,
 )
-from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.exceptions import ConfigEntryNotReady, HomeAssistantError
 import voluptuous as vol
 import homeassistant.helpers.config_validation as cv
+import re
 import time
 import datetime
 import logging
@@ -55,6 +84,16 @@ CONFIG_SCHEMA = vol.Schema({
     })
 }, extra=vol.ALLOW_EXTRA)
 
+SET_MAC_CONTROL_SCHEMA = vol.All(
+    vol.Schema({
+        vol.Required("enabled"): cv.boolean,
+        vol.Optional("ids"): vol.All(cv.ensure_list_csv, [cv.string]),
+        vol.Optional("macs"): vol.All(cv.ensure_list_csv, [cv.string]),
+        vol.Optional("config_entry_id"): cv.string,
+    }),
+    cv.has_at_least_one_key("ids", "macs"),
+)
+
 
 async def async_setup(hass: HomeAssistant, config: Config) -> bool:
     """Set up the iKuai component."""
@@ -70,6 +109,39 @@ async def async_setup(hass: HomeAssistant, config: Config) -> bool:
         _LOGGER.info("No custom switches configured in configuration.yaml.")
     # Store the configurations in hass.data
     hass.data[DOMAIN]["custom_switches"] = custom_switches_config
+
+    async def async_set_mac_control(call: ServiceCall):
+        """Enable or disable many MAC control rules in batched acl_mac actions."""
+        ids = {str(rule_id).strip() for rule_id in call.data.get("ids", [])}
+        macs = {mac.strip().lower().replace("-", ":") for mac in call.data.get("macs", [])}
+        jobs, matched = [], set()
+        for entry_id, entry_data in hass.data[DOMAIN].items():
+            if not isinstance(entry_data, dict) or COORDINATOR not in entry_data:
+                continue
+            if call.data.get("config_entry_id", entry_id) != entry_id:
+                continue
+            coordinator = entry_data[COORDINATOR]
+            mac_control = coordinator.data.get("mac_control") if coordinator.data else None
+            if not isinstance(mac_control, dict):
+                continue
+            rule_ids = []
+            for rule_id, rule in mac_control.items():
+                mac = str(rule.get("mac", "")).lower()
+                if rule_id in ids or mac in macs:
+                    rule_ids.append(rule_id)
+                    matched.update((rule_id, mac))
+            if rule_ids:
+                jobs.append(coordinator.async_set_mac_control(rule_ids, call.data["enabled"]))
+        unmatched = (ids | macs) - matched
+        if unmatched:
+            _LOGGER.warning("set_mac_control: no MAC control rule for %s", ", ".join(sorted(unmatched)))
+        if not jobs:
+            raise HomeAssistantError("No matching iKuai MAC control rules")
+        await asyncio.gather(*jobs)
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_SET_MAC_CONTROL, async_set_mac_control, schema=SET_MAC_CONTROL_SCHEMA
+    )
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -79,6 +151,13 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     passwd = entry.data[CONF_PASSWD]
     pas = entry.data[CONF_PASS]
     update_interval_seconds = entry.options.get(CONF_UPDATE_INTERVAL, 10)
+    hosts_interval = entry.options.get(CONF_HOSTS_UPDATE_INTERVAL, DEFAULT_HOSTS_UPDATE_INTERVAL)
+    slow_interval = entry.options.get(CONF_SLOW_UPDATE_INTERVAL, DEFAULT_SLOW_UPDATE_INTERVAL)
+    section_intervals = {section: hosts_interval for section in HOSTS_SECTIONS}
+    section_intervals.update({section: slow_interval for section in SLOW_SECTIONS})
+    # 离线判定按时间计算：默认沿用"缓冲次数 × 在线设备刷新间隔"
+    act_buffer = entry.options.get(CONF_ACT_BUFFER, entry.data.get(CONF_ACT_BUFFER, 2))
+    consider_home = entry.options.get(CONF_CONSIDER_HOME, act_buffer * hosts_interval)
     
     if entry.data.get(CONF_SOURCE_MODE) == MODE_CONST:
         try:
@@ -101,11 +180,42 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         
     custom_switches_config = hass.data[DOMAIN].get("custom_switches", {})
 
-    coordinator = IKUAIDataUpdateCoordinator(hass, host, username, passwd, pas, update_interval_seconds, tracker_config, custom_switches_config)
-    await coordinator.async_refresh()
+    coordinator = IKUAIDataUpdateCoordinator(
+        hass, host, username, passwd, pas, update_interval_seconds, tracker_config, custom_switches_config,
+        section_intervals, consider_home, hosts_interval
+    )
+    if entry.options.get(CONF_ADAPTIVE_POLLING, False):
+        coordinator.enable_adaptive_polling(
+            entry.options.get(CONF_ADAPTIVE_MIN_INTERVAL, MIN_UPDATE_INTERVAL),
+            entry.options.get(CONF_ADAPTIVE_MAX_INTERVAL, DEFAULT_ADAPTIVE_MAX_INTERVAL),
+        )
+    if entry.options.get(CONF_WARM_UP, False):
+        await coordinator.async_warm_up()
+    if entry.options.get(CONF_CAPTURE, False):
+        # 调试用：抓取原始响应，可用 capture.ReplaySession 离线回放
+        coordinator.enable_capture(hass.config.path(f"ikuai_capture_{_host_slug(host)}.jsonl.gz"))
+    await coordinator.session.async_load()
+    # 有上次保存的快照时直接用旧值加载平台（标记为 stale），否则只抓取系统状态；
+    # 完整数据都在平台就绪后于后台抓取
+    if not await coordinator.async_restore_snapshot():
+        await coordinator.async_bootstrap()
+
+        if not coordinator.last_update_success:
+            await coordinator.async_shutdown()
+            raise ConfigEntryNotReady
+
+    async def _async_save_snapshot(event):
+        await coordinator.async_save_snapshot()
 
-    if not coordinator.last_update_success:
-        raise ConfigEntryNotReady
+    async def _async_close_session(event):
+        await coordinator.async_shutdown()
+
+    entry.async_on_unload(
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_save_snapshot)
+    )
+    entry.async_on_unload(
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close_session)
+    )
 
     undo_listener = entry.add_update_listener(update_listener)
 
@@ -115,6 +225,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     }
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    entry.async_create_background_task(hass, coordinator.async_refresh(), f"{DOMAIN} {host} full refresh")
 
     return True
 
@@ -132,77 +243,409 @@ async def async_unload_entry(hass, entry):
     hass.data[DOMAIN][entry.entry_id][UNDO_UPDATE_LISTENER]()
 
     if unload_ok:
+        await hass.data[DOMAIN][entry.entry_id][COORDINATOR].async_shutdown()
         hass.data[DOMAIN].pop(entry.entry_id)
 
     return unload_ok
 
+async def async_remove_entry(hass, entry):
+    """Delete the data kept on disk for a removed config entry."""
+    host = entry.data[CONF_HOST]
+    # sess_key 是有效的登录凭据，集成删除后不应留在 .storage 中
+    await async_remove_session(hass, _session_key(host))
+    entry_data = hass.data.get(DOMAIN, {}).pop(entry.entry_id, None)
+    if entry_data is not None:
+        # 卸载失败时协调器仍在运行，先让它停止写快照
+        await entry_data[COORDINATOR].async_remove_snapshot()
+    else:
+        await Store(hass, SNAPSHOT_STORAGE_VERSION, _snapshot_key(host)).async_remove()
+
 async def update_listener(hass, entry):
     """Handle options update."""
     await hass.config_entries.async_reload(entry.entry_id)
 
+def _host_slug(host):
+    """Return the router address as a file/storage friendly name."""
+    return re.sub(r"[^0-9A-Za-z]+", "_", host.split("://")[-1]).strip("_")
+
+def _session_key(host):
+    return f"session_{_host_slug(host)}"
+
+def _snapshot_key(host):
+    return f"{DOMAIN}.snapshot_{_host_slug(host)}"
+
+
 class IKUAIDataUpdateCoordinator(DataUpdateCoordinator):
     """Class to manage fetching iKuai data."""
 
-    def __init__(self, hass, host, username, passwd, pas, update_interval_seconds, tracker_config, custom_switches_config):
+    def __init__(self, hass, host, username, passwd, pas, update_interval_seconds, tracker_config, custom_switches_config,
+                 section_intervals=None, consider_home=None, buffer_seconds=None):
         """Initialize the coordinator."""
         update_interval = datetime.timedelta(seconds=update_interval_seconds)
         _LOGGER.debug("%s Data will be update every %s", host, update_interval)
-        self._token = ""
-        self._token_expire_time = 0
-        self._allow_login = True
     
         super().__init__(hass, _LOGGER, name=DOMAIN, update_interval=update_interval)
 
-        self._fetcher = DataFetcher(hass, host, username, passwd, pas, tracker_config, custom_switches_config)
+        self._fetcher = DataFetcher(
+            hass, host, username, passwd, pas, tracker_config, custom_switches_config, section_intervals,
+            consider_home if consider_home is not None else update_interval_seconds * 2,
+            buffer_seconds or update_interval_seconds,
+        )
+        self.session = SessionManager(hass, self._fetcher, _session_key(host))
+        self._snapshot_store = Store(hass, SNAPSHOT_STORAGE_VERSION, _snapshot_key(host))
+        self._snapshot_saved = time.monotonic()
+        self._snapshot_removed = False
+        # True while data is the restored snapshot rather than a live refresh
+        self.stale = False
         self.host = host
+        self._tracker_config = tracker_config or {}
+        self._update_interval_seconds = update_interval_seconds
+        self._adaptive = None
+        # 变更检测：None 表示全部实体都需要写入状态
+        self._changed_keys = None
+        self._notified_success = None
+        self.writes_avoided = 0
+        self._bootstrapping = False
+        # 定向刷新：按 (section, 名称) 合并并发的读取请求
+        self._refresh_locks = {}
+        self._refresh_requested = {}
+        self._refresh_done = {}
+        # 乐观更新：section -> (时间, 数据键)，早于该时间开始的读取不再覆盖这些键
+        self._optimistic = {}
+
+    def enable_adaptive_polling(self, minimum, maximum):
+        """Let router load and traffic steer the interval within bounds."""
+        self._adaptive = AdaptiveInterval(self._update_interval_seconds, minimum, maximum)
+
+    def _adapt_interval(self, data, latency):
+        """Pick the next update interval after a successful poll."""
+        if self._adaptive is None:
+            return
+        try:
+            cpu = float(data.get("ikuai_cpu") or 0)
+        except (TypeError, ValueError):
+            cpu = 0
+        traffic = (data.get("ikuai_upload") or 0) + (data.get("ikuai_download") or 0)
+        seconds = self._adaptive.update(cpu, latency, traffic)
+        if seconds != self.update_interval.total_seconds():
+            _LOGGER.debug("%s cpu=%s%% latency=%.2fs, next update in %ss", self.host, cpu, latency, seconds)
+            self.update_interval = datetime.timedelta(seconds=seconds)
+
+    def _diff_keys(self, old_data, new_data):
+        """Return the data keys whose values differ between two snapshots.
+
+        For dict valued keys in KEYED_DATA the changed items are reported as
+        (key, item) too, so e.g. a tracker only wakes up for its own target.
+        """
+        if not old_data or not new_data:
+            return None
+        changed = set()
+        for key in old_data.keys() | new_data.keys():
+            old_value, new_value = old_data.get(key), new_data.get(key)
+            if old_value == new_value:
+                continue
+            if key in KEYED_DATA and (key in old_data) != (key in new_data):
+                # 整个 section 出现或消失（如启动引导后首次完整抓取），全部实体都要写入
+                return None
+            changed.add(key)
+            if key in KEYED_DATA:
+                old_items = old_value if isinstance(old_value, dict) else {}
+                new_items = new_value if isinstance(new_value, dict) else {}
+                changed.update(
+                    (key, item) for item in old_items.keys() | new_items.keys()
+                    if old_items.get(item) != new_items.get(item)
+                )
+        return changed
+
+    @callback
+    def async_add_entity_listener(self, update_callback, keys):
+        """Listen for updates, but only call back when one of ``keys`` changed."""
+        keys = frozenset(keys)
+
+        @callback
+        def _listener():
+            if self._changed_keys is None or not keys.isdisjoint(self._changed_keys):
+                update_callback()
+            else:
+                self.writes_avoided += 1
+
+        return self.async_add_listener(_listener)
+
+    @callback
+    def async_update_listeners(self):
+        """Notify listeners, forcing a full write when availability flipped."""
+        if self.last_update_success != self._notified_success:
+            self._notified_success = self.last_update_success
+            self._changed_keys = None
+        elif not self.last_update_success:
+            self._changed_keys = set()
+        super().async_update_listeners()
+        self._changed_keys = set()
+        _LOGGER.debug("%s state writes avoided so far: %s", self.host, self.writes_avoided)
         
+    @property
+    def connection_stats(self):
+        """Return how many router connections were opened vs. reused."""
+        return {
+            "opened": self._fetcher.connections_opened,
+            "reused": self._fetcher.connections_reused,
+        }
+
+    @property
+    def request_metrics(self):
+        """Return per-endpoint latency, size, decode and error counters."""
+        return self._fetcher.metrics.as_dict()
+
+    @property
+    def breaker_state(self):
+        """Return the circuit breaker state and seconds until the next probe."""
+        breaker = self._fetcher.breaker
+        return {
+            "state": breaker.state,
+            "failures": breaker.failures,
+            "retry_in": round(breaker.retry_in(), 1),
+        }
+
+    def enable_capture(self, path):
+        """Record raw router responses to ``path`` for offline replay."""
+        self._fetcher.enable_capture(path)
+
+    def lan_hosts_snapshot(self, max_age=LAN_SNAPSHOT_TTL):
+        """Return the last LAN host table if it is at most ``max_age`` seconds old."""
+        if self._fetcher.lan_hosts is None or time.monotonic() - self._fetcher.lan_hosts_fetched > max_age:
+            return None
+        return self._fetcher.lan_hosts
+
+    async def async_get_lan_hosts(self, max_age=LAN_SNAPSHOT_TTL):
+        """Return the LAN host table ({"ip": {}, "mac": {}}), fetching it only when the snapshot is too old."""
+        hosts = self.lan_hosts_snapshot(max_age)
+        if hosts is None:
+            # 复用协调器的会话，不额外登录；只请求一次，超时由 requestpost_json 自身的 10 秒限制，
+            # 不在共享的 fetcher 外再套 wait_for，以免取消协调器正在进行的请求
+            hosts = await self.session.async_call(self._fetcher._get_all_lan_hosts)
+        # 重新登录后仍失败（包括再次 401）时按未取到处理
+        return hosts if isinstance(hosts, dict) else None
+
+    async def async_warm_up(self):
+        """Open keep-alive connections to the router ahead of the first poll."""
+        await self._fetcher.async_warm_up()
+
+    async def async_restore_snapshot(self):
+        """Load the last saved snapshot as stale data; returns True if there was one."""
+        stored = await self._snapshot_store.async_load()
+        if not stored or not stored.get("data"):
+            return False
+        data = dict(stored["data"])
+        # Store 以 JSON 保存，时间戳需还原为 datetime
+        if isinstance(data.get("ikuai_last_update"), str):
+            data["ikuai_last_update"] = datetime.datetime.fromisoformat(data["ikuai_last_update"])
+        self.data = data
+        self.stale = True
+        _LOGGER.debug("%s restored snapshot from %s", self.host, data.get("ikuai_last_update"))
+        return True
+
+    def _snapshot(self):
+        return {"data": {key: value for key, value in self.data.items() if key not in SNAPSHOT_SKIP_KEYS}}
+
+    async def async_save_snapshot(self):
+        """Persist the current data for the next start."""
+        if self.data and not self.stale and not self._snapshot_removed:
+            await self._snapshot_store.async_save(self._snapshot())
+            self._snapshot_saved = time.monotonic()
+
+    async def async_remove_snapshot(self):
+        """Delete the saved snapshot and stop saving new ones."""
+        self._snapshot_removed = True
+        await self._snapshot_store.async_remove()
+
+    async def async_shutdown(self):
+        """Cancel refreshes and close the router's client session."""
+        await self.async_save_snapshot()
+        await super().async_shutdown()
+        await self.session.async_close()
+        await self._fetcher.async_close()
+
+    async def async_bootstrap(self):
+        """Run the first refresh with homepage/sysstat only."""
+        self._bootstrapping = True
+        try:
+            await self.async_refresh()
+        finally:
+            self._bootstrapping = False
+
     async def get_access_token(self):
         """Get or refresh the access token."""
-        if time.time() < self._token_expire_time:
-            return self._token
-        else:
-            if self._allow_login == True:
-                self._token = await self._fetcher._login_ikuai()
-                if not isinstance(self._token, str):
-                    if self._token == 10001:
-                        self._allow_login = False
-                    return None
-                    
-                self._token_expire_time = time.time() + 60*60*2          
-                return self._token
-            else:
-                _LOGGER.error("The username or password has been incorrect, please reconfigure the ikuai integration.")
-                return
+        return await self.session.async_get()
 
     async def _async_update_data(self):
         """Update data via DataFetcher."""
-        _LOGGER.debug("token_expire_time=%s", self._token_expire_time)
-        if self._allow_login == True:
-            sess_key = await self.get_access_token()
-            if not sess_key:
-                raise UpdateFailed("Failed to get access token")
-            
-            _LOGGER.debug(sess_key) 
+        _LOGGER.debug("sess_key expires at %s", self.session.expires)
+        if self.session.auth_failed:
+            raise UpdateFailed("The username or password has been incorrect, please reconfigure the ikuai integration.")
+        if self._fetcher.breaker.retry_in() > 0:
+            raise UpdateFailed(
+                f"iKuai {self.host} unreachable, next probe in {self._fetcher.breaker.retry_in():.0f}s"
+            )
 
-            try:
-                async with timeout(60):
-                    data = await self._fetcher.get_data(sess_key)
-                    if data == 401:
-                        self._token_expire_time = 0
-                        return
-                    if not data:
-                        raise UpdateFailed("failed in getting data")
-                    return data
-            except Exception as error:
-                raise UpdateFailed(error) from error
+        try:
+            async with timeout(60):
+                started = time.monotonic()
+                bootstrap = self._bootstrapping
+                # 会话过期时透明重新登录并重试一次
+                data = await self.session.async_call(lambda sess_key: self._fetcher.get_data(sess_key, bootstrap))
+                if data == 401:
+                    raise UpdateFailed("iKuai session expired")
+                if not data:
+                    raise UpdateFailed("failed in getting data")
+                self._keep_optimistic(data, started)
+                self._changed_keys = self._diff_keys(self.data, data)
+                if not bootstrap:
+                    self._fire_presence_events()
+                    self._adapt_interval(data, time.monotonic() - started)
+                    if not self._snapshot_removed and time.monotonic() - self._snapshot_saved >= SNAPSHOT_SAVE_INTERVAL:
+                        self._snapshot_saved = time.monotonic()
+                        # 延迟到新数据生效后再保存
+                        self._snapshot_store.async_delay_save(self._snapshot, 1)
+                if self.stale:
+                    # 首次实时数据：所有实体都要写入以清除 stale 标记
+                    self.stale = False
+                    self._changed_keys = None
+                return data
+        except UpdateFailed:
+            raise
+        except Exception as error:
+            raise UpdateFailed(error) from error
+
+    def _keep_optimistic(self, data, started):
+        """Keep the current values of sections switched while this poll was running."""
+        if not self.data:
+            return
+        for section, (patched_at, keys) in self._optimistic.items():
+            if patched_at <= started:
+                continue
+            for key in keys:
+                if key in self.data:
+                    data[key] = self.data[key]
+            # 本轮读到的是操作前的状态，下次轮询重新读取该 section
+            self._fetcher.expire_sections(section)
+
+    def _fire_presence_events(self):
+        """Fire an event for every tracker that arrived or left this cycle."""
+        changes, self._fetcher.presence_changes = self._fetcher.presence_changes, []
+        for target_id, is_home in changes:
+            self.hass.bus.async_fire(EVENT_PRESENCE_CHANGED, {
+                "host": self.host,
+                "target": target_id,
+                "name": self._tracker_config.get(target_id, {}).get("name", target_id),
+                "state": "home" if is_home else "not_home",
+            })
 
     async def async_control_device(self, action_body):
         """Execute action for iKuai devices."""
-        if self._allow_login:
-            sess_key = await self.get_access_token()
-            if not sess_key:
+        result = await self.session.async_call(
+            lambda sess_key: self._fetcher.async_execute_action(sess_key, action_body)
+        )
+        # 操作后下次刷新需重新读取所有慢速 section 以确认状态
+        self._fetcher.expire_sections()
+        return result
+
+    async def async_control_section(self, action_body, section, optimistic=None, name=None):
+        """Run a switch action, show ``optimistic`` data at once and confirm it with a targeted read.
+
+        Only ``section`` is re-read (one switch's show body when ``name`` is
+        given, the ACL list for mac_control) instead of a full poll.
+        """
+        result = await self.session.async_call(
+            lambda sess_key: self._fetcher.async_execute_action(sess_key, action_body)
+        )
+        if action_succeeded(result) and optimistic:
+            self.async_apply_partial(optimistic, section)
+        await self.async_refresh_section(section, name)
+        return result
+
+    async def async_set_mac_control(self, rule_ids, enabled):
+        """Enable or disable ACL rules with as few acl_mac actions as possible.
+
+        Rule ids are sent comma joined, MAC_CONTROL_BATCH_SIZE per action;
+        the new state is shown at once and the ACL list is re-read once.
+        """
+        action = "up" if enabled else "down"
+        batches = [rule_ids[i:i + MAC_CONTROL_BATCH_SIZE] for i in range(0, len(rule_ids), MAC_CONTROL_BATCH_SIZE)]
+        succeeded = set()
+        for batch in batches:
+            body = {"func_name": "acl_mac", "action": action, "param": {"id": ",".join(batch)}}
+            result = await self.session.async_call(
+                lambda sess_key, body=body: self._fetcher.async_execute_action(sess_key, body)
+            )
+            if action_succeeded(result):
+                succeeded.update(batch)
+            else:
+                _LOGGER.warning("iKuai %s: acl_mac %s failed for rules %s: %s", self.host, action, body["param"]["id"], result)
+        mac_control = self.data.get("mac_control") if self.data else None
+        if succeeded and isinstance(mac_control, dict):
+            enabled_value = "yes" if enabled else "no"
+            self.async_apply_partial({"mac_control": {
+                rule_id: {**rule, "enabled": enabled_value} if rule_id in succeeded else rule
+                for rule_id, rule in mac_control.items()
+            }}, SECTION_MAC_CONTROL)
+        await self.async_refresh_section(SECTION_MAC_CONTROL)
+        if len(succeeded) < len(rule_ids):
+            raise HomeAssistantError(
+                f"iKuai {self.host}: {len(rule_ids) - len(succeeded)} of {len(rule_ids)} MAC control rules not changed"
+            )
+
+    async def async_refresh_section(self, section, name=None):
+        """Re-read one section and merge it into the data; return True on success.
+
+        Concurrent requests for the same section share a single read, as
+        long as that read started after they were made.  When the read
+        fails the section is expired so the next poll fetches it.
+        """
+        key = (section, name)
+        self._refresh_requested[key] = requested = self._refresh_requested.get(key, 0) + 1
+        lock = self._refresh_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            done, ok = self._refresh_done.get(key, (0, False))
+            if done >= requested:
+                return ok
+            started = self._refresh_requested[key]
+            if section == SECTION_SWITCH:
+                request = lambda sess_key: self._fetcher.async_refresh_switch(sess_key, name)
+            else:
+                request = self._fetcher.async_refresh_mac_control
+            read_at = time.monotonic()
+            try:
+                patch = await self.session.async_call(request)
+            except Exception as error:
+                _LOGGER.debug("Targeted refresh of %s failed: %s", key, error)
+                patch = None
+            if isinstance(patch, dict):
+                self.async_apply_partial(patch, section, read_at)
+            else:
+                self._fetcher.expire_sections(section)
+            self._refresh_done[key] = (started, isinstance(patch, dict))
+            return isinstance(patch, dict)
+
+    @callback
+    def async_apply_partial(self, patch, section=None, read_at=None):
+        """Merge ``patch`` into the data and notify only the entities it changes.
+
+        A ``section`` patch without ``read_at`` is an optimistic update; one
+        read at ``read_at`` is dropped when the section was switched again
+        after that read started, the next targeted read confirms it instead.
+        """
+        if not self.data:
+            return
+        if section is not None:
+            if read_at is None:
+                self._optimistic[section] = (time.monotonic(), tuple(patch))
+            elif read_at < self._optimistic.get(section, (read_at,))[0]:
+                _LOGGER.debug("Dropping %s read older than its last switch action", section)
                 return
-            result = await self._fetcher.async_execute_action(sess_key, action_body)
-            if result == 401:
-                self._token_expire_time = 0
-            return result
+        new_data = {**self.data, **patch}
+        changed = self._diff_keys(self.data, new_data)
+        if changed == set():
+            return
+        self.data = new_data
+        self._changed_keys = changed
+        self.async_update_listeners()
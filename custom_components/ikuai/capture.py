@@ -0,0 +1,177 @@
+"""Record router responses to a capture file and replay them without a router."""
+import asyncio
+import base64
+import gzip
+import json
+import logging
+import time
+from http.cookies import SimpleCookie
+
+_LOGGER = logging.getLogger(__name__)
+
+# 抓包中需要脱敏的字段（登录凭据、会话、PPPoE 账号等）
+SCRUB_KEYS = {"username", "passwd", "pass", "password", "sess_key", "pppoe_name", "pppoe_passwd", "pppoe_username", "pppoe_password"}
+SCRUBBED = "***"
+CAPTURE_MAX_RECORDS = 20000
+
+
+def _scrub(value):
+    """Return (value with SCRUB_KEYS masked, True if anything was masked)."""
+    if isinstance(value, dict):
+        changed = False
+        result = {}
+        for key, item in value.items():
+            if key in SCRUB_KEYS and item is not None:
+                result[key] = SCRUBBED
+                changed = True
+            else:
+                result[key], item_changed = _scrub(item)
+                changed = changed or item_changed
+        return result, changed
+    if isinstance(value, list):
+        items = [_scrub(item) for item in value]
+        return [item for item, _ in items], any(changed for _, changed in items)
+    return value, False
+
+
+def request_key(url, json_body):
+    """Return the key a request is matched on when replaying."""
+    path = url.split("://", 1)[-1].partition("/")[2]
+    return f"/{path} {json.dumps(_scrub(json_body)[0], sort_keys=True, ensure_ascii=False)}"
+
+
+class CaptureWriter:
+    """Append scrubbed request/response pairs to a gzip JSON-lines file.
+
+    Records are buffered in memory and written from the executor by
+    ``async_flush`` so the event loop never blocks on file I/O.
+    """
+
+    def __init__(self, path, max_records=CAPTURE_MAX_RECORDS):
+        """Initialize the writer."""
+        self.path = path
+        self.max_records = max_records
+        self.records = 0
+        self._pending = []
+        self._start = time.monotonic()
+
+    def record(self, url, json_body, status, content, elapsed, charset=None, cookies=()):
+        """Buffer one exchange; ``content`` is the raw response body."""
+        if self.records >= self.max_records:
+            if self.records == self.max_records:
+                _LOGGER.warning("Capture %s reached %d records, no longer recording", self.path, self.max_records)
+                self.records += 1
+            return
+        self.records += 1
+        if content and charset:
+            try:
+                payload, changed = _scrub(json.loads(content.decode(charset)))
+                if changed:
+                    content = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode(charset)
+            except (ValueError, UnicodeError):
+                pass
+        self._pending.append(json.dumps({
+            "t": round(time.monotonic() - self._start, 4),
+            "key": request_key(url, json_body),
+            "status": status,
+            "elapsed": round(elapsed, 4),
+            # 只记录 cookie 名称，值一律脱敏
+            "cookies": list(cookies),
+            "body": base64.b64encode(content or b"").decode(),
+        }, ensure_ascii=False))
+
+    def _write(self, lines):
+        with gzip.open(self.path, "at", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+
+    async def async_flush(self):
+        """Write buffered records to the capture file."""
+        if not self._pending:
+            return
+        lines, self._pending = self._pending, []
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, lines)
+        except OSError as e:
+            _LOGGER.error("Cannot write capture %s: %s", self.path, e)
+
+
+def load_capture(path):
+    """Read a capture file into {request key: [records in order]}."""
+    exchanges = {}
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                exchanges.setdefault(record["key"], []).append(record)
+    return exchanges
+
+
+class _ReplayResponse:
+    def __init__(self, record):
+        self.status = record["status"]
+        self._body = base64.b64decode(record["body"])
+        self.cookies = SimpleCookie()
+        for name in record.get("cookies", ()):
+            self.cookies[name] = "replay"
+
+    async def read(self):
+        return self._body
+
+
+class _ReplayRequest:
+    def __init__(self, session, key):
+        self._session = session
+        self._key = key
+
+    async def __aenter__(self):
+        record = self._session.next_record(self._key)
+        if record is None:
+            return _ReplayResponse({"status": 404, "body": ""})
+        if self._session.speed:
+            await asyncio.sleep(record["elapsed"] / self._session.speed)
+        return _ReplayResponse(record)
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class ReplaySession:
+    """Stand-in for the router's aiohttp session that serves a capture.
+
+    Each request is answered with the next recorded response for the same
+    URL and body (cycling when the capture runs out), after the recorded
+    latency divided by ``speed``; ``speed=0`` answers immediately.
+    Requests that were never captured get HTTP 404.
+    """
+
+    def __init__(self, exchanges, speed=1.0):
+        """Initialize from ``load_capture`` output."""
+        self._exchanges = exchanges
+        self._positions = {}
+        self.speed = speed
+        self.closed = False
+        self.misses = 0
+
+    @classmethod
+    def from_file(cls, path, speed=1.0):
+        """Load a capture file (blocking)."""
+        return cls(load_capture(path), speed)
+
+    def next_record(self, key):
+        records = self._exchanges.get(key)
+        if not records:
+            self.misses += 1
+            _LOGGER.debug("No captured response for %s", key)
+            return None
+        position = self._positions.get(key, 0)
+        self._positions[key] = position + 1
+        return records[position % len(records)]
+
+    def post(self, url, headers=None, json=None):
+        return _ReplayRequest(self, request_key(url, json))
+
+    def get(self, url, **kwargs):
+        return _ReplayRequest(self, request_key(url, None))
+
+    async def close(self):
+        self.closed = True
@@ -2,12 +2,10 @@
 from __future__ import annotations
 import logging
 import voluptuous as vol
-import requests
 import json
 import base64
 import re
 import ipaddress
-import asyncio
 from hashlib import md5
 from urllib.parse import unquote
 
@@ -21,13 +19,20 @@ from homeassistant.helpers.selector import (
     TextSelectorConfig
 )
 from homeassistant.const import CONF_HOST, CONF_USERNAME, CONF_PASSWORD
+from homeassistant.util import slugify
 
 from .const import (
-    LOGIN_URL, ACTION_URL, DOMAIN, 
+    DOMAIN, 
     CONF_PASSWD, CONF_PASS, CONF_UPDATE_INTERVAL, 
+    CONF_HOSTS_UPDATE_INTERVAL, CONF_SLOW_UPDATE_INTERVAL, CONF_WARM_UP, CONF_CAPTURE, CONF_CONSIDER_HOME,
+    CONF_ADAPTIVE_POLLING, CONF_ADAPTIVE_MIN_INTERVAL, CONF_ADAPTIVE_MAX_INTERVAL, DEFAULT_ADAPTIVE_MAX_INTERVAL,
+    DEFAULT_HOSTS_UPDATE_INTERVAL, DEFAULT_SLOW_UPDATE_INTERVAL, MIN_UPDATE_INTERVAL,
     CONF_ACT_BUFFER, CONF_TRACKER_CONFIG,
-    CONF_SOURCE_MODE, MODE_UI, MODE_CONST
+    CONF_SOURCE_MODE, MODE_UI, MODE_CONST, RESULT_BAD_AUTH, COORDINATOR, TRACKER_SUBNET,
+    TRACKER_GROUP, GROUP_MODES, GROUP_MODE_ANY,
 )
+from .data_fetcher import DataFetcher
+from .polling import async_retry
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -51,6 +56,59 @@ ACTION_OPTIONS = [
     OPTION_ACTION_SAVE
 ]
 
+
+async def _async_try_login(fetcher):
+    """Test if the login credentials are valid."""
+    result = await async_retry(fetcher._login_ikuai)
+    if result == RESULT_BAD_AUTH:
+        return {"status": "error", "error": "invalid_auth"}
+    if not isinstance(result, str):
+        return {"status": "error", "error": "cannot_connect"}
+    return {"status": "success", "sess_key": result}
+
+
+async def _async_fetch_lan_info(fetcher, sess_key):
+    """Fetch current online device information from the router.
+
+    Returns ({ip: label}, {mac: label}), or None if the router did not answer.
+    """
+    if not sess_key:
+        return {}, {}
+    devices = await async_retry(lambda: fetcher._get_all_lan_hosts(sess_key))
+    if not isinstance(devices, dict):
+        return None
+    return _lan_labels(devices)
+
+
+def _lan_labels(devices):
+    """Turn a LAN host table into ({ip: label}, {mac: label})."""
+    hosts, macs = {}, {}
+    for table, labels in ((devices["ip"], hosts), (devices["mac"], macs)):
+        for key, item in table.items():
+            raw_comment = item.get("comment", "")
+            comment = unquote(raw_comment) if raw_comment else ""
+            labels[key] = f"{key} ({comment})" if comment else key
+    return hosts, macs
+
+
+def _group_trackers(trackers, name, mode, existing=()):
+    """Fold the ip/mac trackers not in ``existing`` into one presence group."""
+    members = [k for k, v in trackers.items() if v["type"] in ("ip", "mac") and k not in existing]
+    if not members:
+        return trackers
+    group_id = f"group_{slugify(name)}"
+    grouped = {k: v for k, v in trackers.items() if k not in members}
+    grouped[group_id] = {"type": TRACKER_GROUP, "id": group_id, "name": name, "buffer": 0, "mode": mode, "members": members}
+    return grouped
+
+
+def _tracker_entry(info, name, buffer):
+    """Return the tracker config saved for one managed device."""
+    entry = {"type": info["type"], "name": name, "buffer": buffer}
+    if info["type"] == TRACKER_GROUP:
+        entry.update(mode=info["mode"], members=info["members"])
+    return entry
+
 class IkuaiConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for iKuai."""
     VERSION = 1
@@ -60,7 +118,7 @@ class IkuaiConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         self._login_data = {}
         self._temp_trackers = {} 
         self._sess_key = None
-        self._host_url = None
+        self._fetcher = None
         self._title = "iKuai"
         self._fetched_hosts = {} 
         self._fetched_macs = {}
@@ -81,7 +139,7 @@ class IkuaiConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             username = user_input[CONF_USERNAME]
             
             try:
-                if int(user_input.get(CONF_UPDATE_INTERVAL, 10)) < 5:
+                if int(user_input.get(CONF_UPDATE_INTERVAL, 10)) < MIN_UPDATE_INTERVAL:
                     errors[CONF_UPDATE_INTERVAL] = "interval_too_small"
                 if int(user_input.get(CONF_ACT_BUFFER, 2)) < 1:
                     errors[CONF_ACT_BUFFER] = "invalid_buffer"
@@ -92,13 +150,13 @@ class IkuaiConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 passwd_md5 = md5(password.encode('utf-8')).hexdigest()
                 passwd_base64 = base64.b64encode(f"salt_11{password}".encode()).decode()
 
-                res = await self.hass.async_add_executor_job(
-                    self._try_login, host, username, passwd_md5, passwd_base64
-                )
+                if self._fetcher is not None:
+                    await self._fetcher.async_close()
+                self._fetcher = DataFetcher(self.hass, host, username, passwd_md5, passwd_base64, {})
+                res = await _async_try_login(self._fetcher)
                 
                 if res.get("status") == "success":
                     self._sess_key = res.get("sess_key")
-                    self._host_url = host
                     self._current_username = username
                     self._title = f"ikuai-{host.split('//')[1] if '//' in host else host}"
                     self._login_data = {
@@ -134,20 +192,11 @@ class IkuaiConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             errors=errors
         )
 
-    def _try_login(self, host, username, passwd, pas):
-        """Test if the login credentials are valid."""
-        header = {"Content-Type": "application/json;charset=UTF-8"}
-        json_body = {"username": username, "passwd": passwd, "pass": pas}
-        try:
-            response = requests.post(host + LOGIN_URL, json=json_body, headers=header, verify=False, timeout=5)
-            if response.status_code != 200:
-                return {"status": "error", "error": "cannot_connect"}
-            resdata = response.json()
-            if resdata.get("Result") == 10001:
-                return {"status": "error", "error": "invalid_auth"}
-            return {"status": "success", "sess_key": response.cookies.get("sess_key")}
-        except Exception:
-            return {"status": "error", "error": "cannot_connect"}
+    @callback
+    def async_remove(self):
+        """Close the flow's router session."""
+        if self._fetcher is not None:
+            self.hass.async_create_task(self._fetcher.async_close())
 
     async def async_step_menu(self, user_input=None):
         """Display the configuration menu."""
@@ -187,31 +236,22 @@ class IkuaiConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     if mac_addr not in selected_macs:
                         self._temp_trackers[mac_addr] = {"type": "mac", "id": mac_addr, "name": display_name, "buffer": 0}
 
+            if user_input.get("group_name"):
+                # 聚合模式：选中的设备合并为一个分组实体
+                self._temp_trackers = _group_trackers(
+                    self._temp_trackers, user_input["group_name"], user_input.get("group_mode", GROUP_MODE_ANY)
+                )
+
             if not self._temp_trackers:
                 errors["base"] = "no_devices_found"
             else:
                 return await self.async_step_manage_devices()
 
-        hosts_dict, macs_dict = {}, {}
-        retry_strategy = [(1, 0.5), (3, 1.0), (5, 0)]
-        retry_success = False
-
-        for attempt, (timeout_sec, wait_sec) in enumerate(retry_strategy):
-            try:
-                hosts_dict, macs_dict = await asyncio.wait_for(
-                    self.hass.async_add_executor_job(
-                        self._fetch_lan_info, self._host_url, self._sess_key, self._current_username
-                    ),
-                    timeout=timeout_sec
-                )
-                retry_success = True
-                break
-            except (asyncio.TimeoutError, Exception):
-                if attempt < 2: await asyncio.sleep(wait_sec)
-
-        if not retry_success:
+        lan_info = await _async_fetch_lan_info(self._fetcher, self._sess_key)
+        if lan_info is None:
             errors["base"] = "cannot_connect"
         else:
+            hosts_dict, macs_dict = lan_info
             try:
                 self._fetched_hosts = dict(sorted(hosts_dict.items(), key=lambda x: ipaddress.ip_address(x[0])))
             except ValueError:
@@ -223,39 +263,12 @@ class IkuaiConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             vol.Optional("selected_ips"): cv.multi_select(self._fetched_hosts),
             vol.Required("mac_filter_mode", default=MODE_INCLUDE): SelectSelector(SelectSelectorConfig(options=MODE_OPTIONS, translation_key="filter_mode")),
             vol.Optional("selected_macs"): cv.multi_select(self._fetched_macs),
+            vol.Optional("group_name"): str,
+            vol.Required("group_mode", default=GROUP_MODE_ANY): SelectSelector(SelectSelectorConfig(options=GROUP_MODES, translation_key="group_mode")),
         })
         
         return self.async_show_form(step_id="scan_add", data_schema=schema, errors=errors)
 
-    def _fetch_lan_info(self, host_url, sess_key, username):
-        """Fetch current online device information from the router."""
-        hosts = {}
-        macs = {}
-        if not sess_key: return hosts, macs
-        header = {
-            'Cookie': f'username={username}; login=1; sess_key={sess_key}',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        json_body = {"func_name": "monitor_lanip", "action": "show", "param": {"TYPE": "data,total", "limit": "0,1000"}}
-        try:
-            response = requests.post(host_url + ACTION_URL, json=json_body, headers=header, verify=False, timeout=5)
-            if response.status_code == 200:
-                res = response.json()
-                if res.get("Data", {}).get("data"):
-                    for item in res["Data"]["data"]:
-                        ip = item.get("ip_addr")
-                        mac = item.get("mac")
-                        raw_comment = item.get("comment", "")
-                        comment = unquote(raw_comment) if raw_comment else ""
-                        label_ip = f"{ip} ({comment})" if comment and ip else (ip or "")
-                        label_mac = f"{mac} ({comment})" if comment and mac else (mac or "")
-                        if ip: hosts[ip] = label_ip
-                        if mac: macs[mac] = label_mac
-        except Exception as e:
-            _LOGGER.error("Error fetching LAN info: %s", e)
-            raise e
-        return hosts, macs
-
     def _extract_name_from_label(self, label):
         """Extract a readable name from a formatted label."""
         match = re.match(r'[^\(]+\((.+)\)$', label)
@@ -312,20 +325,19 @@ class IkuaiConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
             is_exclude = (ip_mode == MODE_EXCLUDE or mac_mode == MODE_EXCLUDE)
             if is_exclude:
-                try:
-                    all_hosts, all_macs = await self.hass.async_add_executor_job(
-                        self._fetch_lan_info, self._host_url, self._sess_key, self._current_username
-                    )
+                lan_info = await _async_fetch_lan_info(self._fetcher, self._sess_key)
+                if lan_info is None:
+                    _LOGGER.error("Failed to fetch LAN info from %s", self._login_data.get(CONF_HOST))
+                    errors["base"] = "cannot_connect"
+                    valid_config = False
+                else:
+                    all_hosts, all_macs = lan_info
                     if ip_mode == MODE_EXCLUDE:
                         for ip, label in all_hosts.items():
                             self._temp_trackers[ip] = {"type": "ip", "id": ip, "name": self._extract_name_from_label(label), "buffer": default_buffer_fill}
                     if mac_mode == MODE_EXCLUDE:
                         for mac, label in all_macs.items():
                             self._temp_trackers[mac] = {"type": "mac", "id": mac, "name": self._extract_name_from_label(label), "buffer": default_buffer_fill}
-                except Exception as e:
-                    _LOGGER.error("Failed to fetch LAN info: %s", e)
-                    errors["base"] = "cannot_connect"
-                    valid_config = False
 
             if ip_text and valid_config:
                 for line in ip_text.replace("\n", ",").split(","):
@@ -350,10 +362,9 @@ class IkuaiConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     try:
                         net = ipaddress.ip_network(addr, strict=False)
                         if subnet_mode == MODE_INCLUDE:
-                            for ip in net.hosts():
-                                ip_str = str(ip)
-                                if ip_str not in self._temp_trackers:
-                                    self._temp_trackers[ip_str] = {"type": "ip", "id": ip_str, "name": name or ip_str, "buffer": buff}
+                            # 整个网段作为一个追踪器保存，不再展开为逐个 IP
+                            cidr = str(net)
+                            self._temp_trackers[cidr] = {"type": TRACKER_SUBNET, "id": cidr, "name": name or cidr, "buffer": buff}
                     except ValueError: errors["custom_subnets"], valid_config = "invalid_subnet_format", False
 
             if mac_text and valid_config:
@@ -394,7 +405,7 @@ class IkuaiConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             final_tracker_config = {}
             
             for target_id, info in self._temp_trackers.items():
-                safe_key = target_id.replace(".", "_").replace(":", "_")
+                safe_key = target_id.replace(".", "_").replace(":", "_").replace("/", "_")
                 new_name = user_input.get(f"name_{safe_key}", info.get("name", target_id))
                 
                 raw_buffer = user_input.get(f"buffer_{safe_key}")
@@ -411,7 +422,7 @@ class IkuaiConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                         new_buffer = 0
 
                 if not errors:
-                    final_tracker_config[target_id] = {"type": info["type"], "name": new_name, "buffer": new_buffer}
+                    final_tracker_config[target_id] = _tracker_entry(info, new_name, new_buffer)
             
             if not errors:
                 return self.async_create_entry(
@@ -422,7 +433,7 @@ class IkuaiConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         schema = {}
         global_default = self._login_data.get(CONF_ACT_BUFFER, 2)
         for target_id, info in self._temp_trackers.items():
-            safe_key = target_id.replace(".", "_").replace(":", "_")
+            safe_key = target_id.replace(".", "_").replace(":", "_").replace("/", "_")
             default_name = info.get("name", target_id)
             val = info.get("buffer", info.get("custom_buffer", 0))
             default_buffer_val = "" if val == 0 else str(val)
@@ -445,6 +456,7 @@ class IkuaiOptionsFlowHandler(config_entries.OptionsFlow):
         self._config_entry = config_entry
         self._login_data = config_entry.data
         self._sess_key = None
+        self._fetcher = None
         self._temp_trackers = {}
         self._fetched_hosts = {} 
         self._fetched_macs = {}
@@ -455,28 +467,49 @@ class IkuaiOptionsFlowHandler(config_entries.OptionsFlow):
     async def _ensure_login_with_retry(self):
         """Ensure session validity for router actions."""
         if self._sess_key: return True
-        flow = IkuaiConfigFlow()
-        try:
-            res = await asyncio.wait_for(
-                self.hass.async_add_executor_job(
-                    flow._try_login, 
-                    self._login_data[CONF_HOST], 
-                    self._login_data[CONF_USERNAME], 
-                    self._login_data[CONF_PASSWD], 
-                    self._login_data[CONF_PASS]
-                ),
-                timeout=10
+        if self._fetcher is None:
+            self._fetcher = DataFetcher(
+                self.hass,
+                self._login_data[CONF_HOST],
+                self._login_data[CONF_USERNAME],
+                self._login_data[CONF_PASSWD],
+                self._login_data[CONF_PASS],
+                {},
             )
-            if res.get("status") == "success":
-                self._sess_key = res.get("sess_key")
-                self._fetch_error = None
-                return True
-        except asyncio.TimeoutError:
-            self._fetch_error = "login_timeout"
-        except Exception as e:
-            self._fetch_error = str(e)
+        res = await _async_try_login(self._fetcher)
+        if res.get("status") == "success":
+            self._sess_key = res.get("sess_key")
+            self._fetch_error = None
+            return True
+        self._fetch_error = res.get("error")
         return False
 
+    def _coordinator(self):
+        """Return the running coordinator of this entry, if it is loaded."""
+        entry_data = self.hass.data.get(DOMAIN, {}).get(self._config_entry.entry_id)
+        return entry_data.get(COORDINATOR) if isinstance(entry_data, dict) else None
+
+    async def _async_lan_info(self):
+        """Return the online devices as ({ip: label}, {mac: label}); None on failure.
+
+        A loaded entry answers from its coordinator's host table (refetched
+        with the coordinator's session only when older than LAN_SNAPSHOT_TTL),
+        so the device picker neither waits for the router nor logs in again.
+        """
+        coordinator = self._coordinator()
+        if coordinator is not None:
+            devices = await coordinator.async_get_lan_hosts()
+            return _lan_labels(devices) if devices is not None else None
+        if not await self._ensure_login_with_retry():
+            return None
+        return await _async_fetch_lan_info(self._fetcher, self._sess_key)
+
+    @callback
+    def async_remove(self):
+        """Close the flow's router session."""
+        if self._fetcher is not None:
+            self.hass.async_create_task(self._fetcher.async_close())
+
     async def async_step_init(self, user_input=None):
         """Initial step for options menu."""
         errors = {}
@@ -493,6 +526,14 @@ class IkuaiOptionsFlowHandler(config_entries.OptionsFlow):
             CONF_SOURCE_MODE, 
             self._config_entry.data.get(CONF_SOURCE_MODE, MODE_UI)
         )
+        current_hosts_interval = self._options.get(CONF_HOSTS_UPDATE_INTERVAL, DEFAULT_HOSTS_UPDATE_INTERVAL)
+        current_slow_interval = self._options.get(CONF_SLOW_UPDATE_INTERVAL, DEFAULT_SLOW_UPDATE_INTERVAL)
+        current_warm_up = self._options.get(CONF_WARM_UP, False)
+        current_capture = self._options.get(CONF_CAPTURE, False)
+        current_consider_home = self._options.get(CONF_CONSIDER_HOME, current_buffer * current_hosts_interval)
+        current_adaptive = self._options.get(CONF_ADAPTIVE_POLLING, False)
+        current_adaptive_min = self._options.get(CONF_ADAPTIVE_MIN_INTERVAL, MIN_UPDATE_INTERVAL)
+        current_adaptive_max = self._options.get(CONF_ADAPTIVE_MAX_INTERVAL, DEFAULT_ADAPTIVE_MAX_INTERVAL)
 
         if user_input is not None:
             try:
@@ -501,14 +542,41 @@ class IkuaiOptionsFlowHandler(config_entries.OptionsFlow):
                     errors[CONF_ACT_BUFFER] = "invalid_buffer"
                     
                 new_interval = int(user_input.get(CONF_UPDATE_INTERVAL, current_interval))
-                if new_interval < 5:
+                if new_interval < MIN_UPDATE_INTERVAL:
                     errors[CONF_UPDATE_INTERVAL] = "interval_too_small"
+
+                new_hosts_interval = int(user_input.get(CONF_HOSTS_UPDATE_INTERVAL, current_hosts_interval))
+                if new_hosts_interval < MIN_UPDATE_INTERVAL:
+                    errors[CONF_HOSTS_UPDATE_INTERVAL] = "interval_too_small"
+
+                new_slow_interval = int(user_input.get(CONF_SLOW_UPDATE_INTERVAL, current_slow_interval))
+                if new_slow_interval < MIN_UPDATE_INTERVAL:
+                    errors[CONF_SLOW_UPDATE_INTERVAL] = "interval_too_small"
+
+                new_consider_home = int(user_input.get(CONF_CONSIDER_HOME, current_consider_home))
+                if new_consider_home < 0:
+                    errors[CONF_CONSIDER_HOME] = "expected_int"
+
+                new_adaptive_min = int(user_input.get(CONF_ADAPTIVE_MIN_INTERVAL, current_adaptive_min))
+                if new_adaptive_min < MIN_UPDATE_INTERVAL:
+                    errors[CONF_ADAPTIVE_MIN_INTERVAL] = "interval_too_small"
+                new_adaptive_max = int(user_input.get(CONF_ADAPTIVE_MAX_INTERVAL, current_adaptive_max))
+                if new_adaptive_max < new_adaptive_min:
+                    errors[CONF_ADAPTIVE_MAX_INTERVAL] = "interval_too_small"
             except (ValueError, TypeError):
                 errors["base"] = "expected_int"
 
             if not errors:
                 self._options[CONF_ACT_BUFFER] = new_buffer
                 self._options[CONF_UPDATE_INTERVAL] = new_interval
+                self._options[CONF_HOSTS_UPDATE_INTERVAL] = new_hosts_interval
+                self._options[CONF_SLOW_UPDATE_INTERVAL] = new_slow_interval
+                self._options[CONF_WARM_UP] = user_input.get(CONF_WARM_UP, current_warm_up)
+                self._options[CONF_CAPTURE] = user_input.get(CONF_CAPTURE, current_capture)
+                self._options[CONF_CONSIDER_HOME] = new_consider_home
+                self._options[CONF_ADAPTIVE_POLLING] = user_input.get(CONF_ADAPTIVE_POLLING, current_adaptive)
+                self._options[CONF_ADAPTIVE_MIN_INTERVAL] = new_adaptive_min
+                self._options[CONF_ADAPTIVE_MAX_INTERVAL] = new_adaptive_max
                 self._options[CONF_SOURCE_MODE] = user_input.get(CONF_SOURCE_MODE)
                 
                 new_data = self._config_entry.data.copy()
@@ -536,7 +604,15 @@ class IkuaiOptionsFlowHandler(config_entries.OptionsFlow):
 
         schema = {
             vol.Optional(CONF_UPDATE_INTERVAL, default=current_interval): vol.Coerce(int),
+            vol.Optional(CONF_ADAPTIVE_POLLING, default=current_adaptive): bool,
+            vol.Optional(CONF_ADAPTIVE_MIN_INTERVAL, default=current_adaptive_min): vol.Coerce(int),
+            vol.Optional(CONF_ADAPTIVE_MAX_INTERVAL, default=current_adaptive_max): vol.Coerce(int),
+            vol.Optional(CONF_HOSTS_UPDATE_INTERVAL, default=current_hosts_interval): vol.Coerce(int),
+            vol.Optional(CONF_SLOW_UPDATE_INTERVAL, default=current_slow_interval): vol.Coerce(int),
+            vol.Optional(CONF_WARM_UP, default=current_warm_up): bool,
+            vol.Optional(CONF_CAPTURE, default=current_capture): bool,
             vol.Optional(CONF_ACT_BUFFER, default=current_buffer): vol.Coerce(int),
+            vol.Optional(CONF_CONSIDER_HOME, default=current_consider_home): vol.Coerce(int),
             vol.Required(CONF_SOURCE_MODE, default=current_mode): SelectSelector(
                 SelectSelectorConfig(options=CONFIG_MODES, translation_key="config_mode")
             ),
@@ -568,59 +644,33 @@ class IkuaiOptionsFlowHandler(config_entries.OptionsFlow):
             mac_mode = user_input.get("mac_filter_mode", MODE_INCLUDE)
             
             if ip_mode == MODE_EXCLUDE or mac_mode == MODE_EXCLUDE:
-                retry_success = False
-                retry_strategy = [(1, 0.5), (3, 1.0), (5, 0)]
-                
-                try:
-                    if await self._ensure_login_with_retry():
-                        flow = IkuaiConfigFlow()
-                        all_hosts, all_macs = {}, {}
-                        
-                        for attempt, (timeout_sec, wait_sec) in enumerate(retry_strategy):
-                            try:
-                                all_hosts, all_macs = await asyncio.wait_for(
-                                    self.hass.async_add_executor_job(
-                                        flow._fetch_lan_info, 
-                                        self._login_data[CONF_HOST], 
-                                        self._sess_key, 
-                                        self._current_username
-                                    ),
-                                    timeout=timeout_sec
-                                )
-                                retry_success = True
-                                break
-                            except (asyncio.TimeoutError, Exception):
-                                if attempt < 2: await asyncio.sleep(wait_sec)
-                        
-                        if retry_success:
-                            self._temp_trackers = {}
-                            default_buffer = 0
-                            
-                            if ip_mode == MODE_EXCLUDE:
-                                for ip, label in all_hosts.items():
-                                    if ip not in selected_ips:
-                                        self._temp_trackers[ip] = {"type": "ip", "id": ip, "name": self._extract_name_from_label(label), "buffer": default_buffer}
-                            else:
-                                self._temp_trackers.update({k: v for k, v in current_config.items() if v["type"] == "ip"})
-                                for item in selected_ips:
-                                    if item not in self._temp_trackers:
-                                        self._temp_trackers[item] = {"type": "ip", "id": item, "name": self._extract_name_from_label(all_hosts.get(item, item)), "buffer": 0}
-
-                            if mac_mode == MODE_EXCLUDE:
-                                for mac, label in all_macs.items():
-                                    if mac not in selected_macs:
-                                        self._temp_trackers[mac] = {"type": "mac", "id": mac, "name": self._extract_name_from_label(label), "buffer": default_buffer}
-                            else:
-                                self._temp_trackers.update({k: v for k, v in current_config.items() if v["type"] == "mac"})
-                                for item in selected_macs:
-                                    if item not in self._temp_trackers:
-                                        self._temp_trackers[item] = {"type": "mac", "id": item, "name": self._extract_name_from_label(all_macs.get(item, item)), "buffer": 0}
-                        else:
-                            errors["base"] = "cannot_connect"
-                    else:
-                        errors["base"] = "cannot_connect"
-                except Exception:
+                lan_info = await self._async_lan_info()
+                if lan_info is None:
                     errors["base"] = "cannot_connect"
+                else:
+                    all_hosts, all_macs = lan_info
+                    self._temp_trackers = {k: v for k, v in current_config.items() if v["type"] in (TRACKER_SUBNET, TRACKER_GROUP)}
+                    default_buffer = 0
+                    
+                    if ip_mode == MODE_EXCLUDE:
+                        for ip, label in all_hosts.items():
+                            if ip not in selected_ips:
+                                self._temp_trackers[ip] = {"type": "ip", "id": ip, "name": self._extract_name_from_label(label), "buffer": default_buffer}
+                    else:
+                        self._temp_trackers.update({k: v for k, v in current_config.items() if v["type"] == "ip"})
+                        for item in selected_ips:
+                            if item not in self._temp_trackers:
+                                self._temp_trackers[item] = {"type": "ip", "id": item, "name": self._extract_name_from_label(all_hosts.get(item, item)), "buffer": 0}
+
+                    if mac_mode == MODE_EXCLUDE:
+                        for mac, label in all_macs.items():
+                            if mac not in selected_macs:
+                                self._temp_trackers[mac] = {"type": "mac", "id": mac, "name": self._extract_name_from_label(label), "buffer": default_buffer}
+                    else:
+                        self._temp_trackers.update({k: v for k, v in current_config.items() if v["type"] == "mac"})
+                        for item in selected_macs:
+                            if item not in self._temp_trackers:
+                                self._temp_trackers[item] = {"type": "mac", "id": item, "name": self._extract_name_from_label(all_macs.get(item, item)), "buffer": 0}
             else:
                 for item in selected_ips:
                     if item not in self._temp_trackers:
@@ -630,49 +680,37 @@ class IkuaiOptionsFlowHandler(config_entries.OptionsFlow):
                     if item not in self._temp_trackers:
                         display_name = self._extract_name_from_label(self._fetched_macs.get(item, item))
                         self._temp_trackers[item] = {"type": "mac", "id": item, "name": display_name, "buffer": 0}
+
+            if not errors and user_input.get("group_name"):
+                self._temp_trackers = _group_trackers(
+                    self._temp_trackers, user_input["group_name"], user_input.get("group_mode", GROUP_MODE_ANY), current_config
+                )
             
             if not errors:
                 return await self.async_step_manage_devices()
         
         if not self._fetched_hosts and not self._fetch_error:
-            retry_success = False
-            retry_strategy = [(1, 0.5), (3, 1.0), (5, 0)]
-            try:
-                if await self._ensure_login_with_retry():
-                    flow = IkuaiConfigFlow()
-                    hosts, macs = {}, {}
-                    for attempt, (timeout_sec, wait_sec) in enumerate(retry_strategy):
-                        try:
-                            hosts, macs = await asyncio.wait_for(
-                                self.hass.async_add_executor_job(flow._fetch_lan_info, self._login_data[CONF_HOST], self._sess_key, self._current_username),
-                                timeout=timeout_sec
-                            )
-                            retry_success = True
-                            break
-                        except (asyncio.TimeoutError, Exception):
-                            if attempt < 2: await asyncio.sleep(wait_sec)
-                    if retry_success:
-                        try:
-                            hosts = dict(sorted(hosts.items(), key=lambda x: ipaddress.ip_address(x[0])))
-                        except ValueError:
-                            hosts = dict(sorted(hosts.items()))
-                        macs = dict(sorted(macs.items()))
-                        existing_keys = set(current_config.keys())
-                        self._fetched_hosts = {k: v for k, v in hosts.items() if k not in existing_keys}
-                        self._fetched_macs = {k: v for k, v in macs.items() if k not in existing_keys}
-                    else:
-                        errors["base"] = "cannot_connect"
-                else:
-                    errors["base"] = "cannot_connect"
-            except Exception as e:
+            lan_info = await self._async_lan_info()
+            if lan_info is None:
                 errors["base"] = "cannot_connect"
-                self._fetch_error = str(e)
+            else:
+                hosts, macs = lan_info
+                try:
+                    hosts = dict(sorted(hosts.items(), key=lambda x: ipaddress.ip_address(x[0])))
+                except ValueError:
+                    hosts = dict(sorted(hosts.items()))
+                macs = dict(sorted(macs.items()))
+                existing_keys = set(current_config.keys())
+                self._fetched_hosts = {k: v for k, v in hosts.items() if k not in existing_keys}
+                self._fetched_macs = {k: v for k, v in macs.items() if k not in existing_keys}
         
         schema = vol.Schema({
             vol.Required("ip_filter_mode", default=MODE_INCLUDE): SelectSelector(SelectSelectorConfig(options=MODE_OPTIONS, translation_key="filter_mode")),
             vol.Optional("selected_ips", default=[]): cv.multi_select(self._fetched_hosts if self._fetched_hosts else {}),
             vol.Required("mac_filter_mode", default=MODE_INCLUDE): SelectSelector(SelectSelectorConfig(options=MODE_OPTIONS, translation_key="filter_mode")),
             vol.Optional("selected_macs", default=[]): cv.multi_select(self._fetched_macs if self._fetched_macs else {}),
+            vol.Optional("group_name"): str,
+            vol.Required("group_mode", default=GROUP_MODE_ANY): SelectSelector(SelectSelectorConfig(options=GROUP_MODES, translation_key="group_mode")),
         })
         
         return self.async_show_form(
@@ -703,27 +741,13 @@ class IkuaiOptionsFlowHandler(config_entries.OptionsFlow):
             is_exclude = (ip_mode == MODE_EXCLUDE or mac_mode == MODE_EXCLUDE)
 
             if is_exclude:
-                retry_success = False
-                retry_strategy = [(1, 0.5), (3, 1.0), (5, 0)]
-                all_hosts, all_macs = {}, {}
-
-                for attempt, (timeout_sec, wait_sec) in enumerate(retry_strategy):
-                    try:
-                        all_hosts, all_macs = await asyncio.wait_for(
-                            self.hass.async_add_executor_job(
-                                self._fetch_lan_info, self._host_url, self._sess_key, self._current_username
-                            ),
-                            timeout=timeout_sec
-                        )
-                        retry_success = True
-                        break
-                    except (asyncio.TimeoutError, Exception):
-                        if attempt < 2: await asyncio.sleep(wait_sec)
-
-                if not retry_success:
+                lan_info = await self._async_lan_info()
+                if lan_info is None:
                     errors["base"] = "cannot_connect"
                 else:
-                    self._temp_trackers = {} 
+                    all_hosts, all_macs = lan_info
+                    # 分组没有对应的输入框，原样保留
+                    self._temp_trackers = {k: v for k, v in current_config.items() if v["type"] == TRACKER_GROUP}
                     
                     if ip_mode == MODE_EXCLUDE:
                         for ip, label in all_hosts.items():
@@ -737,7 +761,7 @@ class IkuaiOptionsFlowHandler(config_entries.OptionsFlow):
                     else:
                         self._temp_trackers.update({k: v for k, v in current_config.items() if v["type"] == "mac"})
             else:
-                self._temp_trackers = {} 
+                self._temp_trackers = {k: v for k, v in current_config.items() if v["type"] == TRACKER_GROUP}
 
             def parse_item(item_str):
                 item_str = item_str.strip()
@@ -793,10 +817,9 @@ class IkuaiOptionsFlowHandler(config_entries.OptionsFlow):
                     try:
                         net = ipaddress.ip_network(addr, strict=False)
                         if subnet_mode == MODE_INCLUDE:
-                            for ip in net.hosts():
-                                ip_str = str(ip)
-                                if ip_str not in self._temp_trackers:
-                                    self._temp_trackers[ip_str] = {"type": "ip", "id": ip_str, "name": name or ip_str, "buffer": buff}
+                            # 整个网段作为一个追踪器保存，不再展开为逐个 IP
+                            cidr = str(net)
+                            self._temp_trackers[cidr] = {"type": TRACKER_SUBNET, "id": cidr, "name": name or cidr, "buffer": buff}
                     except ValueError: errors["custom_subnets"], valid_config = "invalid_subnet_format", False
 
             if mac_text and not errors:
@@ -815,6 +838,7 @@ class IkuaiOptionsFlowHandler(config_entries.OptionsFlow):
             if valid_config and not errors: return await self.async_step_manage_devices()
 
         default_ip_text = []
+        default_subnet_text = []
         default_mac_text = []
         for k, v in current_config.items():
             entry_str = k
@@ -825,14 +849,16 @@ class IkuaiOptionsFlowHandler(config_entries.OptionsFlow):
             
             if v["type"] == "ip":
                 default_ip_text.append(entry_str)
-            else:
+            elif v["type"] == TRACKER_SUBNET:
+                default_subnet_text.append(entry_str)
+            elif v["type"] == "mac":
                 default_mac_text.append(entry_str)
 
         schema = vol.Schema({
             vol.Required("ip_filter_mode", default=MODE_INCLUDE): SelectSelector(SelectSelectorConfig(options=MODE_OPTIONS, translation_key="filter_mode")),
             vol.Optional("custom_ips", default=", ".join(default_ip_text)): TextSelector(TextSelectorConfig(multiline=True)),
             vol.Required("subnet_filter_mode", default=MODE_INCLUDE): SelectSelector(SelectSelectorConfig(options=[MODE_INCLUDE], translation_key="filter_mode")),
-            vol.Optional("custom_subnets"): TextSelector(TextSelectorConfig(multiline=True)),
+            vol.Optional("custom_subnets", default=", ".join(default_subnet_text)): TextSelector(TextSelectorConfig(multiline=True)),
             vol.Required("mac_filter_mode", default=MODE_INCLUDE): SelectSelector(SelectSelectorConfig(options=MODE_OPTIONS, translation_key="filter_mode")),
             vol.Optional("custom_macs", default=", ".join(default_mac_text)): TextSelector(TextSelectorConfig(multiline=True)),
         })
@@ -844,7 +870,7 @@ class IkuaiOptionsFlowHandler(config_entries.OptionsFlow):
         if user_input is not None:
             final_config = {}
             for target_id, info in self._temp_trackers.items():
-                safe_key = target_id.replace(".", "_").replace(":", "_")
+                safe_key = target_id.replace(".", "_").replace(":", "_").replace("/", "_")
                 new_name = user_input.get(f"name_{safe_key}", info.get("name", target_id))
                 
                 raw_buffer = user_input.get(f"buffer_{safe_key}")
@@ -860,7 +886,7 @@ class IkuaiOptionsFlowHandler(config_entries.OptionsFlow):
                         new_buffer = 0
 
                 if not errors:
-                    final_config[target_id] = {"type": info["type"], "name": new_name, "buffer": new_buffer}
+                    final_config[target_id] = _tracker_entry(info, new_name, new_buffer)
             
             if not errors:
                 new_data = {**self._config_entry.data, CONF_TRACKER_CONFIG: final_config}
@@ -870,7 +896,7 @@ class IkuaiOptionsFlowHandler(config_entries.OptionsFlow):
         schema = {}
         global_default = self._options.get(CONF_ACT_BUFFER, 2)
         for target_id, info in self._temp_trackers.items():
-            safe_key = target_id.replace(".", "_").replace(":", "_")
+            safe_key = target_id.replace(".", "_").replace(":", "_").replace("/", "_")
             schema[vol.Required(f"name_{safe_key}", default=info.get("name", target_id))] = str
             
             val = info.get("buffer", info.get("custom_buffer", 0))
@@ -10,19 +10,95 @@ CONF_HOST = "host"
 CONF_TOKEN_EXPIRE_TIME = "token_expire_time"
 COORDINATOR = "coordinator"
 CONF_UPDATE_INTERVAL = "update_interval_seconds"
+CONF_HOSTS_UPDATE_INTERVAL = "hosts_update_interval_seconds"
+CONF_SLOW_UPDATE_INTERVAL = "slow_update_interval_seconds"
+CONF_WARM_UP = "warm_up_connections"
+CONF_CAPTURE = "capture_responses"
+CONF_ADAPTIVE_POLLING = "adaptive_polling"
+CONF_ADAPTIVE_MIN_INTERVAL = "adaptive_min_interval_seconds"
+CONF_ADAPTIVE_MAX_INTERVAL = "adaptive_max_interval_seconds"
 CONF_CUSTOM_SWITCHES = "custom_switches"
 CONF_ACT_BUFFER = "act_buffer"
+CONF_CONSIDER_HOME = "consider_home_seconds"
 CONF_TRACKER_CONFIG = "tracker_config"
 CONF_SOURCE_MODE = "source_mode"
 MODE_UI = "mode_ui"
 MODE_CONST = "mode_const"
+# 网段追踪器：整个 CIDR 作为一个追踪目标
+TRACKER_SUBNET = "subnet"
+# 分组追踪器：一组设备聚合为一个实体，状态为在线数量或任一/全部在线
+TRACKER_GROUP = "group"
+GROUP_MODE_COUNT = "count"
+GROUP_MODE_ANY = "any"
+GROUP_MODE_ALL = "all"
+GROUP_MODES = [GROUP_MODE_ANY, GROUP_MODE_ALL, GROUP_MODE_COUNT]
 
 UNDO_UPDATE_LISTENER = "undo_update_listener"
 
+SERVICE_SET_MAC_CONTROL = "set_mac_control"
+# 批量启用/禁用 ACL 规则时，每个 acl_mac 请求最多携带的规则 id 数
+MAC_CONTROL_BATCH_SIZE = 50
+# ACL 规则增删后同步 MAC 控制开关实体的最小间隔（秒）
+MAC_CONTROL_SYNC_INTERVAL = 30
+
+EVENT_PRESENCE_CHANGED = "ikuai_presence_changed"
+
+##### HTTP client
+MAX_CONCURRENT_REQUESTS = 3
+KEEPALIVE_TIMEOUT = 30
+DNS_CACHE_TTL = 300
+# 连续失败达到阈值后熔断，按指数退避发送探测请求
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_BASE_BACKOFF = 10
+BREAKER_MAX_BACKOFF = 300
+# 配置流程的重试策略：每次尝试的 (超时秒数, 失败后等待秒数)
+RETRY_STRATEGY = ((1, 0.5), (3, 1.0), (5, 0))
+# 选项流程复用协调器的在线设备表，超过该秒数才重新抓取
+LAN_SNAPSHOT_TTL = 60
+# 登录会话：按 2 小时有效期计算，到期前 5 分钟后台续期
+SESSION_LIFETIME = 7200
+SESSION_RENEW_BEFORE = 300
+SESSION_STORAGE_VERSION = 1
+RESULT_BAD_AUTH = 10001
+RESULT_SESSION_EXPIRED = 10014
+# 快照：定期及关闭时保存最近一次数据，重启后先用旧值显示
+SNAPSHOT_STORAGE_VERSION = 1
+SNAPSHOT_SAVE_INTERVAL = 900
+SNAPSHOT_SKIP_KEYS = {
+    "querytime", "ikuai_api_latency", "ikuai_api_latency_attrs", "ikuai_api_errors", "ikuai_api_errors_attrs",
+}
+
+MIN_UPDATE_INTERVAL = 2
+DEFAULT_CONSIDER_HOME = 60
+DEFAULT_ADAPTIVE_MAX_INTERVAL = 60
+DEFAULT_HOSTS_UPDATE_INTERVAL = 30
+DEFAULT_SLOW_UPDATE_INTERVAL = 300
+
+##### Polling sections
+# sysstat (homepage) is refreshed every cycle, the others only when due.
+SECTION_LAN_HOSTS = "lan_hosts"
+SECTION_WAN = "wan"
+SECTION_IPV6 = "ipv6"
+SECTION_MAC_CONTROL = "mac_control"
+SECTION_SWITCH = "switch"
+SECTION_TRACKER = "tracker"
+
+HOSTS_SECTIONS = [SECTION_LAN_HOSTS]
+SLOW_SECTIONS = [SECTION_WAN, SECTION_IPV6, SECTION_MAC_CONTROL, SECTION_SWITCH]
+
 ##### IKUAI URL
 LOGIN_URL = "/Action/login"
 ACTION_URL = "/Action/call"
 
+##### IKUAI show bodies polled every cycle
+WANINFO_BODY = {"func_name":"lan","action":"show","param":{"TYPE":"ether_info,snapshoot"}}
+WAN6INFO_BODY = {"func_name":"ipv6","action":"show","param":{"TYPE":"data,total"}}
+LAN6INFO_BODY = {"func_name":"ipv6","action":"show","param":{"TYPE":"lan_data,lan_total"}}
+MAC_CONTROL_BODY = {"func_name":"acl_mac","action":"show","param":{"TYPE":"total,data"}}
+MAC_CONTROL_PAGE_SIZE = 100
+LAN_HOSTS_BODY = {"func_name": "monitor_lanip", "action": "show", "param": {"TYPE": "data,total"}}
+LAN_HOSTS_PAGE_SIZE = 500
+
 
 ### Sensor Configuration
 
@@ -37,6 +113,7 @@ SENSOR_TYPES = {
         "label": "CPU占用",
         "name": "CPU",
         "unit_of_measurement": "%",
+        "state_class": "measurement",
     },
      "ikuai_cputemp": {
         "icon": "mdi:thermometer",
@@ -44,54 +121,63 @@ SENSOR_TYPES = {
         "name": "CPU_temperature",
         "unit_of_measurement": "°C",
         "device_class": "temperature",
+        "state_class": "measurement",
     },
     "ikuai_memory": {
         "icon": "mdi:memory",
         "label": "内存占用",
         "name": "Memory",
         "unit_of_measurement": "%",
+        "state_class": "measurement",
     },
     "ikuai_online_user": {
         "icon": "mdi:account-multiple",
         "label": "在线终端数",
         "name": "Online_user",
         "unit_of_measurement": "个",
+        "state_class": "measurement",
     },
     "ikuai_ap_online": {
         "icon": "mdi:access-point",
         "label": "AP数",
         "name": "Ap_online",
         "unit_of_measurement": "个",
+        "state_class": "measurement",
     },
     "ikuai_total_up": {
         "icon": "mdi:upload-network",
         "label": "上传总量",
         "name": "Totalup",
         "unit_of_measurement": "GB",
+        "state_class": "total_increasing",
     },
     "ikuai_total_down": {
         "icon": "mdi:download-network",
         "label": "下载总量",
         "name": "Totaldown",
         "unit_of_measurement": "GB",
+        "state_class": "total_increasing",
     },
     "ikuai_upload": {
         "icon": "mdi:wifi-arrow-up",
         "label": "上传速度",
         "name": "Upload",
         "unit_of_measurement": "MB/s",
+        "state_class": "measurement",
     },
     "ikuai_download": {
         "icon": "mdi:wifi-arrow-down",
         "label": "下载速度",
         "name": "Download",
         "unit_of_measurement": "MB/s",
+        "state_class": "measurement",
     },
     "ikuai_connect_num": {
         "icon": "mdi:lan-connect",
         "label": "连接数",
         "name": "Connect_num",
         "unit_of_measurement": "个",
+        "state_class": "measurement",
     },
     "ikuai_wan_ip": {
         "icon": "mdi:ip-network-outline",
@@ -113,6 +199,47 @@ SENSOR_TYPES = {
         "label": "LAN IP6",
         "name": "Lan6_ip",
     },
+    "ikuai_last_update": {
+        "icon": "mdi:update",
+        "label": "最后更新时间",
+        "name": "Last_update",
+        "device_class": "timestamp",
+        "entity_category": "diagnostic",
+    },
+    "ikuai_api_latency": {
+        "icon": "mdi:timer-outline",
+        "label": "接口平均延迟",
+        "name": "Api_latency",
+        "unit_of_measurement": "ms",
+        "state_class": "measurement",
+        "entity_category": "diagnostic",
+        "enabled_default": False,
+    },
+    "ikuai_api_errors": {
+        "icon": "mdi:alert-circle-outline",
+        "label": "接口错误数",
+        "name": "Api_errors",
+        "state_class": "total_increasing",
+        "entity_category": "diagnostic",
+        "enabled_default": False,
+    },
+}
+
+# 按条目做变更检测的数据键（{id: 记录}）
+KEYED_DATA = ("tracker", "subnet", "group", "mac_control")
+
+# 随每次轮询变化的属性，不写入 recorder
+SENSOR_UNRECORDED_ATTRIBUTES = {
+    "total", "available", "free", "cached", "buffers", "used",
+    "upload", "download", "total_up", "total_down", "connect_num", "updatetime",
+    # 接口延迟传感器的按接口细分
+    "endpoints",
+}
+
+# LAN 主机记录中的实时计数，不作为 device_tracker 属性
+TRACKER_VOLATILE_ATTRIBUTES = {
+    "upload", "download", "total_up", "total_down", "connect_num",
+    "uptime", "signal", "timestamp", "ip_addr_int",
 }
 
 
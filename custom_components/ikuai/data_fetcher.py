@@ -7,100 +7,338 @@ get ikuai info by token and sess_key
 
 import logging
 import json
+import re
 import time
 import datetime
 import asyncio
+import aiohttp
 from async_timeout import timeout
-from aiohttp.client_exceptions import ClientConnectorError
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
+from .presence import PresenceEngine, GroupPresence
+from .polling import CircuitBreaker
+from .metrics import RequestMetrics
+from .capture import CaptureWriter
+from .subnets import SubnetIndex
 from .const import (
+    MAX_CONCURRENT_REQUESTS,
+    KEEPALIVE_TIMEOUT,
+    DNS_CACHE_TTL,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_BASE_BACKOFF,
+    BREAKER_MAX_BACKOFF,
     LOGIN_URL,
     ACTION_URL,
     SWITCH_TYPES,
+    WANINFO_BODY,
+    WAN6INFO_BODY,
+    LAN6INFO_BODY,
+    MAC_CONTROL_BODY,
+    MAC_CONTROL_PAGE_SIZE,
+    LAN_HOSTS_BODY,
+    LAN_HOSTS_PAGE_SIZE,
+    SECTION_LAN_HOSTS,
+    SECTION_WAN,
+    SECTION_IPV6,
+    SECTION_MAC_CONTROL,
+    SECTION_SWITCH,
+    SECTION_TRACKER,
+    TRACKER_SUBNET,
+    TRACKER_GROUP,
+    TRACKER_VOLATILE_ATTRIBUTES,
+    DEFAULT_CONSIDER_HOME,
+    RESULT_BAD_AUTH,
+    RESULT_SESSION_EXPIRED,
 )
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 _LOGGER = logging.getLogger(__name__)
 
+# 依次尝试：UTF-8 -> GBK -> GB18030 -> Latin-1（Latin-1 不会失败，作为兜底）
+RESPONSE_CHARSETS = ("utf-8", "gbk", "gb18030", "latin-1")
+
+
+def json_loads(data):
+    """Parse JSON from str or bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def decode_response(content, charset="utf-8"):
+    """Decode and parse a router response in a single pass.
+
+    Strict UTF-8 is always tried first: a GBK decode of UTF-8 Chinese text
+    succeeds but garbles it, so the charset that worked last time (e.g. GBK
+    host comments) only decides the order of the fallbacks.
+    Returns (parsed JSON or text, charset used).
+    """
+    if orjson is not None:
+        # orjson 直接解析 UTF-8 字节（严格校验编码），省去一次 decode
+        try:
+            return orjson.loads(content), "utf-8"
+        except ValueError:
+            pass
+
+    fallbacks = ("utf-8",) + tuple(sorted(RESPONSE_CHARSETS[1:], key=lambda c: c != charset))
+    text = None
+    for encoding in fallbacks:
+        try:
+            text = content.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+        # Latin-1 只作兜底，不记住
+        if encoding != "latin-1":
+            charset = encoding
+        break
+
+    try:
+        return json_loads(text), charset
+    except ValueError:
+        pass
+    if orjson is not None:
+        # orjson 不支持超过 64 位的整数，用标准库再解析一次
+        try:
+            return json.loads(text), charset
+        except ValueError:
+            pass
+    return text, charset
+
+
+def action_succeeded(resdata):
+    """Return True if an /Action/call response reports success (code=0 or Result=30000)."""
+    return isinstance(resdata, dict) and (resdata.get("code") == 0 or resdata.get("Result") == 30000)
+
+
 class DataFetcher:
     """Class to fetch data from iKuai router."""
 
-    def __init__(self, hass, host, username, passwd, pas, tracker_config, custom_switches_config=None):
+    def __init__(self, hass, host, username, passwd, pas, tracker_config, custom_switches_config=None, section_intervals=None,
+                 consider_home=DEFAULT_CONSIDER_HOME, buffer_seconds=10):
         """Initialize the data fetcher."""
         self._host = host
         self._username = username
         self._passwd = passwd
         self._pass = pas
         self._hass = hass
-        self._session_client = async_get_clientsession(hass, verify_ssl=False)
-        self._datatracker = {}
-        self._datarefreshtimes = {}
-        self._tracker_config = tracker_config if tracker_config else {}
+        self._session = None
+        self._charset = "utf-8"
+        self.connections_opened = 0
+        self.connections_reused = 0
+        tracker_config = tracker_config if tracker_config else {}
+        # 子网追踪器整体作为一个区间匹配，不展开为逐个 IP
+        subnet_config = {
+            target_id: config for target_id, config in tracker_config.items() if config.get("type") == TRACKER_SUBNET
+        }
+        self._subnets = SubnetIndex({target_id: target_id for target_id in subnet_config})
+        # 网段在线判定同样按缓冲时间去抖：最后一次有主机在线后 consider_home 秒内仍算在家
+        self._subnet_presence = PresenceEngine({
+            target_id: config.get("buffer", 0) * buffer_seconds if config.get("buffer", 0) else consider_home
+            for target_id, config in subnet_config.items()
+        })
+        self._groups = self._build_groups(
+            {target_id: config for target_id, config in tracker_config.items() if config.get("type") == TRACKER_GROUP},
+            consider_home, buffer_seconds,
+        )
+        self._tracker_config = {
+            target_id: config for target_id, config in tracker_config.items()
+            if config.get("type") not in (TRACKER_SUBNET, TRACKER_GROUP)
+        }
+        self._tracker_targets = self._normalize_tracker_targets(self._tracker_config)
+        # 设备自定义缓冲次数按基础刷新间隔换算为秒，0 表示使用全局 consider_home
+        self._presence = PresenceEngine({
+            target_id: config.get("buffer", 0) * buffer_seconds if config.get("buffer", 0) else consider_home
+            for target_id, config in self._tracker_config.items()
+        })
+        self.presence_changes = []
         self._custom_switches_config = custom_switches_config or {}
-        self._semaphore = asyncio.Semaphore(3)
-
-    def is_json(self, jsonstr):
-        """Check if a string is valid JSON."""
-        try:
-            json.loads(jsonstr)
-        except (ValueError, TypeError):
-            return False
-        return True
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self.breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_BASE_BACKOFF, BREAKER_MAX_BACKOFF)
+        self.metrics = RequestMetrics()
+        self._capture = None
+        # 分级轮询：每个 section 独立的刷新间隔（秒），未到期的沿用上次数据
+        self._section_intervals = section_intervals or {}
+        self._section_updated = {}
+        self._section_data = {}
+        # 最近一次完整抓取的 LAN 主机表，供选项流程复用
+        self.lan_hosts = None
+        self.lan_hosts_fetched = 0
+
+    @property
+    def _session_client(self):
+        """Return the router's own client session, creating it on first use.
+
+        Each router gets a dedicated connector instead of HA's shared pool so
+        keep-alive connections (and their TLS sessions) are reused between
+        polls and the per-host limit matches the request semaphore.
+        """
+        if self._session is None or self._session.closed:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_end.append(self._on_connection_create_end)
+            trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+            connector = aiohttp.TCPConnector(
+                ssl=False,
+                limit=MAX_CONCURRENT_REQUESTS,
+                limit_per_host=MAX_CONCURRENT_REQUESTS,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=DNS_CACHE_TTL,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                cookie_jar=aiohttp.DummyCookieJar(),
+                trace_configs=[trace_config],
+            )
+        return self._session
+
+    async def _on_connection_create_end(self, session, context, params):
+        self.connections_opened += 1
+
+    async def _on_connection_reuseconn(self, session, context, params):
+        self.connections_reused += 1
+
+    async def async_warm_up(self):
+        """Open the keep-alive connections before the first poll."""
+        async def _open():
+            try:
+                async with timeout(10):
+                    async with self._session_client.get(self._host, allow_redirects=False) as response:
+                        await response.read()
+            except Exception as e:
+                _LOGGER.debug("Warm-up connection to %s failed: %s", self._host, e)
+
+        await asyncio.gather(*[_open() for _ in range(MAX_CONCURRENT_REQUESTS)])
+        _LOGGER.debug("%s warmed up %d connections", self._host, self.connections_opened)
+
+    def enable_capture(self, path):
+        """Record every request and raw response to a gzip capture file."""
+        self._capture = CaptureWriter(path)
+        _LOGGER.warning("Recording iKuai %s responses to %s", self._host, path)
+
+    def use_transport(self, session):
+        """Send requests through ``session`` (e.g. a capture ReplaySession) instead of the network."""
+        self._session = session
+
+    async def async_close(self):
+        """Close the router's client session."""
+        if self._capture is not None:
+            await self._capture.async_flush()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _section_due(self, section, now):
+        """Return True if a section has to be fetched in this cycle."""
+        last = self._section_updated.get(section)
+        if last is None:
+            return True
+        interval = self._section_intervals.get(section, 0)
+        # 允许 1 秒误差，避免轮询抖动导致整整错过一个周期
+        return now - last >= interval - 1
+
+    def expire_sections(self, *sections):
+        """Force the given sections (default: all) to be fetched next cycle."""
+        for section in sections or list(self._section_updated):
+            self._section_updated.pop(section, None)
+
+    def _record_reachable(self):
+        if self.breaker.record_success():
+            _LOGGER.info("iKuai %s is reachable again", self._host)
+
+    def _record_network_error(self, e):
+        if self.breaker.record_failure():
+            _LOGGER.warning(
+                "Network error visiting iKuai %s: %s; pausing requests for %.0fs",
+                self._host, e, self.breaker.retry_in()
+            )
+        elif self.breaker.state == CircuitBreaker.CLOSED:
+            _LOGGER.warning("Network error visiting iKuai: %s", e)
+        else:
+            _LOGGER.debug("Probe to iKuai %s failed: %s, next in %.0fs", self._host, e, self.breaker.retry_in())
 
     async def requestpost_json(self, url, headerstr, json_body):
         """Send an asynchronous POST request and return JSON data."""
         async with self._semaphore:
+            if not self.breaker.allow_request():
+                return None
+            # 熔断半开时放行的探测请求，未正常结束（被取消等）时需交还
+            probe = self.breaker.state == CircuitBreaker.HALF_OPEN
+            start = time.monotonic()
+            size, decode, error = 0, 0.0, True
             try:
                 async with timeout(10):
                     async with self._session_client.post(url, headers=headerstr, json=json_body) as response:
+                        self._record_reachable()
                         if response.status != 200:
+                            if self._capture is not None:
+                                self._capture.record(url, json_body, response.status, b"", time.monotonic() - start)
                             return None
                         
-                        # 直接读取原始字节流，手动尝试多种编码解码
                         content = await response.read()
-                        
-                        text = None
-                        # 依次尝试：UTF-8 -> GBK -> GB18030 -> Latin-1
-                        for encoding in ['utf-8', 'gbk', 'gb18030', 'latin-1']:
-                            try:
-                                text = content.decode(encoding)
-                                break
-                            except UnicodeDecodeError:
-                                continue
-                        
-                        # 如果所有已知编码都失败，则忽略错误强制解码（防止集成崩溃）
-                        if text is None:
-                            text = content.decode('utf-8', errors='ignore')
-                            _LOGGER.debug("All standard decodings failed, using ignore mode.")
-
-                        if self.is_json(text):
-                            return json.loads(text)
-                        return text
-            except (ClientConnectorError, asyncio.TimeoutError) as e:
-                _LOGGER.warning("Network error visiting iKuai: %s", e)
+                        size = len(content)
+                        decode_start = time.monotonic()
+                        result, charset = decode_response(content, self._charset)
+                        decode = time.monotonic() - decode_start
+                        if charset != self._charset:
+                            _LOGGER.debug("%s responses are %s encoded", self._host, charset)
+                            self._charset = charset
+                        if self._capture is not None:
+                            self._capture.record(url, json_body, response.status, content, time.monotonic() - start, charset)
+                        error = False
+                        return result
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self._record_network_error(e)
                 return None
             except Exception as e:
                 _LOGGER.error("Unexpected error in requestpost_json: %s", e)
                 return None
+            finally:
+                self.metrics.record(json_body, time.monotonic() - start, size, decode, error)
+                if probe:
+                    self.breaker.release_probe()
 
     async def requestpost_cookies(self, url, headerstr, json_body):
         """Send a POST request and extract the sess_key from cookies."""
         async with self._semaphore:
+            if not self.breaker.allow_request():
+                return None
+            # 熔断半开时放行的探测请求，未正常结束（被取消等）时需交还
+            probe = self.breaker.state == CircuitBreaker.HALF_OPEN
+            start = time.monotonic()
+            error = True
             try:
                 async with timeout(10):
                     async with self._session_client.post(url, headers=headerstr, json=json_body) as response:
+                        self._record_reachable()
+                        if self._capture is not None:
+                            self._capture.record(url, json_body, response.status, b"", time.monotonic() - start,
+                                                 cookies=list(response.cookies))
                         if response.status != 200:
                             return None
+                        error = False
                         for cookie in response.cookies:
                             if cookie == "sess_key":
                                 return response.cookies["sess_key"].value
+                        # 没有 sess_key 时区分账号密码错误与其他失败
+                        result, _ = decode_response(await response.read(), self._charset)
+                        if isinstance(result, dict) and result.get("Result") == RESULT_BAD_AUTH:
+                            return RESULT_BAD_AUTH
                         return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self._record_network_error(e)
+                return None
             except Exception as e:
                 _LOGGER.error("Error in requestpost_cookies: %s", e)
                 return None
+            finally:
+                self.metrics.record(json_body, time.monotonic() - start, error=error)
+                if probe:
+                    self.breaker.release_probe()
 
     async def _login_ikuai(self):
-        """Perform login to iKuai and return the session key."""
+        """Perform login to iKuai and return the session key (RESULT_BAD_AUTH on wrong credentials)."""
         header = {"Content-Type": "application/json;charset=UTF-8"}
         json_body = {"username": self._username, "passwd": self._passwd, "pass": self._pass}
         url = self._host + LOGIN_URL
@@ -125,9 +363,8 @@ class DataFetcher:
 
     def _get_data_block(self, resdata):
         """Helper to extract data block compatible with both API versions."""
-        if not isinstance(resdata, dict): return None
         # 兼容性判断：成功状态码可能是 code=0 (新) 或 Result=30000 (旧)
-        if resdata.get("code") == 0 or resdata.get("Result") == 30000:
+        if action_succeeded(resdata):
             # 数据块可能在 results (新) 或 Data (旧)
             return resdata.get("results") or resdata.get("Data")
         return None
@@ -140,8 +377,9 @@ class DataFetcher:
         }
         json_body = {"func_name":"homepage","action":"show","param":{"TYPE":"sysstat,ac_status"}}
         resdata = await self.requestpost_json(self._host + ACTION_URL, header, json_body)
+        if resdata is None: return False
 
-        if isinstance(resdata, dict) and resdata.get("Result") == 10014: return 401
+        if isinstance(resdata, dict) and resdata.get("Result") == RESULT_SESSION_EXPIRED: return 401
         
         data_block = self._get_data_block(resdata)
         if not data_block: return
@@ -180,11 +418,7 @@ class DataFetcher:
             data_dict["querytime"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         return
 
-    async def _get_ikuai_waninfo(self, sess_key, data_dict):
-        header = {'Cookie': f'username={self._username}; login=1; sess_key={sess_key}', 'Content-Type': 'application/json;charset=UTF-8'}
-        json_body = {"func_name":"lan","action":"show","param":{"TYPE":"ether_info,snapshoot"}}
-        resdata = await self.requestpost_json(self._host + ACTION_URL, header, json_body)
-        
+    async def _get_ikuai_waninfo(self, sess_key, resdata, data_dict):
         data_block = self._get_data_block(resdata)
         if not data_block: return
         
@@ -212,45 +446,51 @@ class DataFetcher:
                     up_time = vlan.get("pppoe_updatetime", 0)
                     data_dict["ikuai_wan_uptime"] = self.seconds_to_dhms(int(time.time() - up_time)) if up_time > 0 else ""
 
-    async def _get_ikuai_lan6info(self, sess_key, data_dict):
-        header = {'Cookie': f'username={self._username}; login=1; sess_key={sess_key}', 'Content-Type': 'application/json;charset=UTF-8'}
-        json_body = {"func_name":"ipv6","action":"show","param":{"TYPE":"lan_data,lan_total"}}
-        resdata = await self.requestpost_json(self._host + ACTION_URL, header, json_body)
+    def _get_ikuai_lan6info(self, resdata, data_dict):
         data_block = self._get_data_block(resdata)
         if data_block and isinstance(data_block.get("lan_data"), list) and data_block["lan_data"]:
             data_dict["ikuai_lan6_ip"] = data_block["lan_data"][0].get("ipv6_addr", "")
 
-    async def _get_ikuai_wan6info(self, sess_key, data_dict):
-        header = {'Cookie': f'username={self._username}; login=1; sess_key={sess_key}', 'Content-Type': 'application/json;charset=UTF-8'}
-        json_body = {"func_name":"ipv6","action":"show","param":{"TYPE":"data,total"}}
-        resdata = await self.requestpost_json(self._host + ACTION_URL, header, json_body)
+    def _get_ikuai_wan6info(self, resdata, data_dict):
         data_block = self._get_data_block(resdata)
         if data_block and isinstance(data_block.get("data"), list) and data_block["data"]:
             data_dict["ikuai_wan6_ip"] = data_block["data"][0].get("dhcp6_ip_addr", "")
 
-    async def _get_ikuai_mac_control(self, sess_key, data_dict):
-        header = {'Cookie': f'username={self._username}; login=1; sess_key={sess_key}', 'Content-Type': 'application/json;charset=UTF-8'}
-        json_body = {"func_name":"acl_mac","action":"show","param":{"TYPE":"total,data","limit":"0,100"}}
-        resdata = await self.requestpost_json(self._host + ACTION_URL, header, json_body)
-        data_block = self._get_data_block(resdata)
-        data_dict["mac_control"] = data_block.get("data", "") if data_block else ""
+    async def _get_ikuai_mac_control(self, sess_key):
+        # 以规则 id 为键，便于开关实体直接查找
+        mac_control = {}
+
+        def index_page(items):
+            for item in items:
+                if isinstance(item, dict) and item.get("id") is not None:
+                    mac_control[str(item["id"])] = item
+
+        # 会话过期时返回 401，交给 SessionManager 重新登录后重试
+        complete = await self._fetch_paged(sess_key, MAC_CONTROL_BODY, MAC_CONTROL_PAGE_SIZE, index_page)
+        if complete == 401:
+            return 401
+        if not complete:
+            return None
+        return mac_control
 
     async def _get_all_lan_hosts(self, sess_key):
-        header = {'Cookie': f'username={self._username}; login=1; sess_key={sess_key}', 'Content-Type': 'application/json;charset=UTF-8'}
-        json_body = {"func_name": "monitor_lanip", "action": "show", "param": {"TYPE": "data,total", "limit": "0,2000"}}
-        resdata = await self.requestpost_json(self._host + ACTION_URL, header, json_body)
-        data_block = self._get_data_block(resdata)
-        
         online_devices = {"ip": {}, "mac": {}}
-        if data_block and isinstance(data_block.get("data"), list):
-            for item in data_block["data"]:
+
+        def index_page(items):
+            for item in items:
                 if item.get("ip_addr"): online_devices["ip"][item["ip_addr"]] = item
                 if item.get("mac"): online_devices["mac"][item["mac"].lower()] = item
+
+        complete = await self._fetch_paged(sess_key, LAN_HOSTS_BODY, LAN_HOSTS_PAGE_SIZE, index_page)
+        if complete == 401:
+            return 401
+        if not complete:
+            return None
+        self.lan_hosts = online_devices
+        self.lan_hosts_fetched = time.monotonic()
         return online_devices
 
-    async def _get_ikuai_switch(self, sess_key, name, show_body, show_on, show_off, data_dict):
-        header = {'Cookie': f'username={self._username}; login=1; sess_key={sess_key}', 'Content-Type': 'application/json;charset=UTF-8'}
-        resdata = await self.requestpost_json(self._host + ACTION_URL, header, show_body)
+    def _get_ikuai_switch(self, resdata, name, show_on, show_off, data_dict):
         data_block = self._get_data_block(resdata)
         if not data_block: return
 
@@ -262,68 +502,347 @@ class DataFetcher:
         else:
             data_dict["switch"].append({"name": name, "onoff": "off"})
 
+    def _switch_definitions(self):
+        """Return (name, show_body, show_on, show_off) for every built-in and custom switch."""
+        switches = [
+            (SWITCH_TYPES[switch]['name'], SWITCH_TYPES[switch]['show_body'],
+             SWITCH_TYPES[switch]['show_on'], SWITCH_TYPES[switch]['show_off'])
+            for switch in SWITCH_TYPES
+        ]
+        switches += [
+            (switch_config['name'], switch_config.get('show_body', {}),
+             switch_config.get('show_on', {}), switch_config.get('show_off', {}))
+            for switch_config in self._custom_switches_config.values()
+        ]
+        return switches
+
+    async def async_refresh_switch(self, sess_key, name):
+        """Re-read a single switch; return the updated switch section data, or None."""
+        definition = next((item for item in self._switch_definitions() if item[0] == name), None)
+        if definition is None:
+            return None
+        _, show_body, show_on, show_off = definition
+        resdata = (await self._fetch_bodies(sess_key, [show_body]))[0]
+        if not resdata:
+            return None
+        section_data = {"switch": []}
+        try:
+            self._get_ikuai_switch(resdata, name, show_on, show_off, section_data)
+        except Exception as e:
+            _LOGGER.error("Error parsing switch %s: %s", name, e)
+            return None
+        if not section_data["switch"]:
+            return None
+        # 只替换这一个开关（保持原顺序），其余沿用上次的数据
+        switches = list(self._section_data.get(SECTION_SWITCH, {}).get("switch", []))
+        index = next((i for i, item in enumerate(switches) if item["name"] == name), len(switches))
+        switches[index:index + 1] = section_data["switch"]
+        self._section_data[SECTION_SWITCH] = {"switch": switches}
+        return self._section_data[SECTION_SWITCH]
+
+    async def async_refresh_mac_control(self, sess_key):
+        """Re-read only the ACL list; return the mac_control section data, None or 401."""
+        mac_control = await self._get_ikuai_mac_control(sess_key)
+        if mac_control is None or mac_control == 401:
+            return mac_control
+        self._section_data[SECTION_MAC_CONTROL] = {"mac_control": mac_control}
+        self._section_updated[SECTION_MAC_CONTROL] = time.monotonic()
+        return self._section_data[SECTION_MAC_CONTROL]
+
+    def _plan_requests(self, bodies):
+        """Merge show bodies that only differ in their TYPE param.
+
+        iKuai answers a comma separated TYPE list with one data block holding
+        every requested key, so bodies sharing func_name and the remaining
+        params can be served by a single call.  Returns a list of
+        (request_body, [indexes into bodies]).
+        """
+        plan = {}
+        for index, body in enumerate(bodies):
+            param = body.get("param")
+            if body.get("action") != "show" or not isinstance(param, dict) or "TYPE" not in param:
+                plan[("single", index)] = (body, None, [index])
+                continue
+            rest = {k: v for k, v in param.items() if k != "TYPE"}
+            key = (body.get("func_name"), json.dumps(rest, sort_keys=True, ensure_ascii=False))
+            if key not in plan:
+                plan[key] = ({"func_name": body.get("func_name"), "action": "show", "param": rest}, [], [])
+            merged, types, members = plan[key]
+            members.append(index)
+            for item in str(param["TYPE"]).split(","):
+                item = item.strip()
+                if item and item not in types:
+                    types.append(item)
+
+        requests = []
+        for body, types, members in plan.values():
+            if types is not None:
+                body = {**body, "param": {"TYPE": ",".join(types), **body["param"]}}
+            requests.append((body, members))
+        return requests
+
+    async def _fetch_bodies(self, sess_key, bodies):
+        """Fetch show bodies with as few calls as possible, one result per body."""
+        header = {'Cookie': f'username={self._username}; login=1; sess_key={sess_key}', 'Content-Type': 'application/json;charset=UTF-8'}
+        plan = self._plan_requests(bodies)
+        _LOGGER.debug("%s planned %d calls for %d show bodies", self._host, len(plan), len(bodies))
+        responses = await asyncio.gather(
+            *[self.requestpost_json(self._host + ACTION_URL, header, body) for body, _ in plan],
+            return_exceptions=True
+        )
+        results = [None] * len(bodies)
+        for (body, members), resdata in zip(plan, responses):
+            if isinstance(resdata, Exception):
+                resdata = None
+            for index in members:
+                results[index] = self._split_response(resdata, bodies[index], body) if len(members) > 1 else resdata
+        return results
+
+    @staticmethod
+    def _body_types(body):
+        return {item.strip() for item in str(body["param"]["TYPE"]).split(",") if item.strip()}
+
+    def _split_response(self, resdata, body, merged_body):
+        """Return a merged show response without the keys of the other bodies' TYPEs.
+
+        Keys named after this body's own TYPEs are kept, as are keys that
+        match no TYPE at all (e.g. the flat ``arp_filter`` of TYPE options).
+        """
+        data_block = self._get_data_block(resdata)
+        if not isinstance(data_block, dict):
+            return resdata
+        others = self._body_types(merged_body) - self._body_types(body)
+        own = {key: value for key, value in data_block.items() if key not in others}
+        block_key = "results" if resdata.get("results") is data_block else "Data"
+        return {**resdata, block_key: own}
+
+    async def _fetch_paged(self, sess_key, body, page_size, on_page):
+        """Fetch every page of a show body paged with ``limit``.
+
+        The first page tells the total; the remaining pages are requested
+        concurrently (bounded by the request semaphore) and handed to
+        ``on_page`` as they arrive.  Returns False if any page failed, 401
+        if the router reported the session expired.
+        """
+        header = {'Cookie': f'username={self._username}; login=1; sess_key={sess_key}', 'Content-Type': 'application/json;charset=UTF-8'}
+
+        def page_body(offset):
+            return {**body, "param": {**body.get("param", {}), "limit": f"{offset},{page_size}"}}
+
+        expired = False
+
+        async def fetch_page(offset):
+            nonlocal expired
+            resdata = await self.requestpost_json(self._host + ACTION_URL, header, page_body(offset))
+            if isinstance(resdata, dict) and RESULT_SESSION_EXPIRED in (resdata.get("Result"), resdata.get("code")):
+                expired = True
+                return None
+            data_block = self._get_data_block(resdata)
+            if not isinstance(data_block, dict):
+                return None
+            return data_block
+
+        first = await fetch_page(0)
+        if first is None:
+            return 401 if expired else False
+        items = first.get("data") if isinstance(first.get("data"), list) else []
+        on_page(items)
+
+        try:
+            total = int(first.get("total", 0))
+        except (TypeError, ValueError):
+            total = 0
+        if not items or total <= len(items):
+            return True
+        # 路由器可能对单页条数有上限，按实际返回条数继续分页
+        page_size = min(page_size, len(items))
+
+        complete = True
+        pages = {asyncio.ensure_future(fetch_page(offset)) for offset in range(page_size, total, page_size)}
+        _LOGGER.debug("%s fetching %d more pages of %s (total %d)", self._host, len(pages), body.get("func_name"), total)
+        try:
+            while pages:
+                done, pages = await asyncio.wait(pages, return_when=asyncio.FIRST_COMPLETED)
+                for page in done:
+                    data_block = page.result()
+                    if data_block is None:
+                        complete = False
+                    elif isinstance(data_block.get("data"), list):
+                        on_page(data_block["data"])
+        finally:
+            # 调用方被取消时，不再让剩余分页占用信号量继续请求路由器
+            for page in pages:
+                page.cancel()
+            if pages:
+                await asyncio.gather(*pages, return_exceptions=True)
+        if expired:
+            return 401
+        return complete
+
     async def async_execute_action(self, sess_key, action_body):
         header = {'Cookie': f'username={self._username}; login=1; sess_key={sess_key}', 'Content-Type': 'application/json;charset=UTF-8'}
         return await self.requestpost_json(self._host + ACTION_URL, header, action_body)
 
-    async def get_data(self, sess_key):
-        """Orchestrate data fetching for all components."""
+    @staticmethod
+    def _normalize_tracker_targets(tracker_config):
+        """Pre-compute the host index key each tracker resolves against."""
+        targets = {}
+        for target_id, config in tracker_config.items():
+            target_type = config.get("type", "mac" if ":" in target_id else "ip")
+            mac = config.get("mac_address")
+            if mac or target_type == "mac":
+                targets[target_id] = ("mac", str(mac or target_id).lower().replace("-", ":"))
+            else:
+                targets[target_id] = ("ip", target_id)
+        return targets
+
+    @staticmethod
+    def _build_groups(group_config, consider_home, buffer_seconds):
+        """Return a GroupPresence for the configured groups, or None."""
+        if not group_config:
+            return None
+        groups, member_consider_home = {}, {}
+        for group_id, config in group_config.items():
+            buffer = config.get("buffer", 0) * buffer_seconds if config.get("buffer", 0) else consider_home
+            members = []
+            for member in config.get("members", []):
+                member = str(member).strip()
+                # IPv6 地址同样含有 ":"，按 MAC 格式判断
+                if re.match(r"^([0-9A-Fa-f]{2}[:-]){5}([0-9A-Fa-f]{2})$", member):
+                    key = ("mac", member.lower().replace("-", ":"))
+                else:
+                    key = ("ip", member)
+                members.append(key)
+                # 同一设备属于多个分组时取最长的缓冲时间
+                member_consider_home[key] = max(buffer, member_consider_home.get(key, 0))
+            groups[group_id] = members
+        return GroupPresence(groups, member_consider_home)
+
+    def _get_trackers(self, all_lan_devices):
+        """Resolve configured trackers against the LAN host table.
+
+        Returns {target_id: host record} for every tracker currently
+        considered home, so each entity needs a single dict lookup.
+        """
+        found = {}
+        for target_id, (target_type, key) in self._tracker_targets.items():
+            found_item = all_lan_devices[target_type].get(key)
+            if found_item:
+                # 去掉实时计数，只保留稳定属性，避免每轮都产生新状态
+                found[target_id] = {k: v for k, v in found_item.items() if k not in TRACKER_VOLATILE_ATTRIBUTES}
+
+        trackers, transitions = self._presence.update(found)
+        self.presence_changes.extend(transitions)
+        return trackers
+
+    def _get_subnets(self, all_lan_devices):
+        """Resolve subnet trackers: live occupancy plus debounced ``home``."""
+        occupancy = self._subnets.occupancy(all_lan_devices["ip"])
+        home, _ = self._subnet_presence.update(
+            {target_id: True for target_id, subnet in occupancy.items() if subnet["count"]}
+        )
+        return {target_id: {**subnet, "home": target_id in home} for target_id, subnet in occupancy.items()}
+
+    async def _finish_cycle(self, new_data):
+        """Add the request statistics to a cycle's data and flush the capture."""
+        # 请求统计：本轮平均延迟与累计错误数，按 func_name/TYPE 细分
+        latency, per_endpoint = self.metrics.end_cycle()
+        new_data["ikuai_api_latency"] = latency
+        new_data["ikuai_api_latency_attrs"] = {"endpoints": per_endpoint}
+        new_data["ikuai_api_errors"], new_data["ikuai_api_errors_attrs"] = self.metrics.errors()
+        if self._capture is not None:
+            await self._capture.async_flush()
+        return new_data
+
+    async def get_data(self, sess_key, bootstrap=False):
+        """Orchestrate data fetching for all components.
+
+        With ``bootstrap`` only homepage/sysstat is fetched, which is enough
+        to set up the platforms; every other section is left out of the data
+        (not defaulted) so its entities stay unknown until the full fetch.
+        """
         new_data = {
-            "switch": [], 
-            "tracker": [], 
-            "ikuai_wan_ip": "未检测到",
             "querytime": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "ikuai_last_update": datetime.datetime.now(datetime.timezone.utc),
             "device_name": "iKuai",
             "sw_version": "Unknown"
         }
-        
+        self.metrics.start_cycle()
+
         # 并发抓取主要状态
         status_res = await self._get_ikuai_status(sess_key, new_data)
         if status_res == 401: return 401
-
-        tasks = [
-            self._get_ikuai_waninfo(sess_key, new_data),
-            self._get_ikuai_wan6info(sess_key, new_data),
-            self._get_ikuai_lan6info(sess_key, new_data),
-            self._get_ikuai_mac_control(sess_key, new_data),
-            self._get_all_lan_hosts(sess_key)
-        ]
-
-        # 抓取内置开关
-        for switch in SWITCH_TYPES:
-            tasks.append(self._get_ikuai_switch(sess_key, SWITCH_TYPES[switch]['name'], 
-                         SWITCH_TYPES[switch]['show_body'], SWITCH_TYPES[switch]['show_on'], 
-                         SWITCH_TYPES[switch]['show_off'], new_data))
-
-        # 抓取自定义开关
-        for _, switch_config in self._custom_switches_config.items():
-            tasks.append(self._get_ikuai_switch(sess_key, switch_config['name'], 
-                         switch_config.get('show_body', {}), switch_config.get('show_on', {}), 
-                         switch_config.get('show_off', {}), new_data))
-
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        all_lan_devices = results[4] if (len(results) > 4 and not isinstance(results[4], Exception)) else None
-
-        # 处理 Tracker 逻辑
-        if self._tracker_config:
-            for target_id, config in self._tracker_config.items():
-                buffer_times = config.get("buffer", 2)
-                target_type = config.get("type", "mac" if ":" in target_id else "ip")
-                found_item = None
-
-                if all_lan_devices:
-                    if target_type == "ip": found_item = all_lan_devices["ip"].get(target_id)
-                    else: found_item = all_lan_devices["mac"].get(target_id.lower())
-
-                if found_item:
-                    self._datatracker[target_id] = found_item
-                    self._datarefreshtimes[target_id] = 0
-                    new_data["tracker"].append(found_item)
-                elif self._datatracker.get(target_id):
-                    curr = self._datarefreshtimes.get(target_id, 0)
-                    if curr < buffer_times:
-                        new_data["tracker"].append(self._datatracker[target_id])
-                        self._datarefreshtimes[target_id] = curr + 1
-
-        return new_data
+        # 路由器不可达时直接放弃本轮，避免后续请求逐个超时
+        if status_res is False: return None
+        if bootstrap:
+            return await self._finish_cycle(new_data)
+        new_data.update({"switch": [], "tracker": {}, "ikuai_wan_ip": "未检测到"})
+
+        now = time.monotonic()
+        requests = []
+        if self._section_due(SECTION_WAN, now):
+            requests.append((SECTION_WAN, WANINFO_BODY))
+        if self._section_due(SECTION_IPV6, now):
+            requests += [(SECTION_IPV6, WAN6INFO_BODY), (SECTION_IPV6, LAN6INFO_BODY)]
+        hosts_due = self._section_due(SECTION_LAN_HOSTS, now)
+        mac_control_due = self._section_due(SECTION_MAC_CONTROL, now)
+
+        switches = []
+        if self._section_due(SECTION_SWITCH, now):
+            switches = self._switch_definitions()
+            requests += [(SECTION_SWITCH, show_body) for _, show_body, _, _ in switches]
+
+        # 合并同 func_name 的查询后并发抓取，LAN 主机表与 ACL 列表单独分页抓取
+        results, all_lan_devices, mac_control = await asyncio.gather(
+            self._fetch_bodies(sess_key, [body for _, body in requests]),
+            self._get_all_lan_hosts(sess_key) if hosts_due else asyncio.sleep(0),
+            self._get_ikuai_mac_control(sess_key) if mac_control_due else asyncio.sleep(0),
+        )
+        if 401 in (all_lan_devices, mac_control):
+            return 401
+        if all_lan_devices is not None:
+            self._section_updated[SECTION_LAN_HOSTS] = now
+        if mac_control is not None:
+            self._section_data[SECTION_MAC_CONTROL] = {"mac_control": mac_control}
+            self._section_updated[SECTION_MAC_CONTROL] = now
+
+        responses = {}
+        for (section, _), resdata in zip(requests, results):
+            responses.setdefault(section, []).append(resdata)
+
+        for section, section_results in responses.items():
+            if not any(section_results):
+                # 本轮失败，保留上次数据并在下个周期重试
+                continue
+            section_data = {}
+            try:
+                if section == SECTION_WAN:
+                    await self._get_ikuai_waninfo(sess_key, section_results[0], section_data)
+                elif section == SECTION_IPV6:
+                    self._get_ikuai_wan6info(section_results[0], section_data)
+                    self._get_ikuai_lan6info(section_results[1], section_data)
+                elif section == SECTION_SWITCH:
+                    section_data["switch"] = []
+                    for (name, _, show_on, show_off), resdata in zip(switches, section_results):
+                        try:
+                            self._get_ikuai_switch(resdata, name, show_on, show_off, section_data)
+                        except Exception as e:
+                            _LOGGER.error("Error parsing switch %s: %s", name, e)
+            except Exception as e:
+                _LOGGER.error("Error parsing iKuai %s data: %s", section, e)
+                continue
+            self._section_data[section] = section_data
+            self._section_updated[section] = now
+
+        # 处理 Tracker 逻辑（仅在 LAN 主机表刷新成功时重新计算）
+        if all_lan_devices is not None:
+            self._section_data[SECTION_TRACKER] = {"tracker": self._get_trackers(all_lan_devices)}
+            if self._subnets:
+                self._section_data[SECTION_TRACKER]["subnet"] = self._get_subnets(all_lan_devices)
+            if self._groups:
+                self._section_data[SECTION_TRACKER]["group"] = self._groups.update(all_lan_devices)
+
+        for section_data in self._section_data.values():
+            new_data.update(section_data)
+
+        return await self._finish_cycle(new_data)
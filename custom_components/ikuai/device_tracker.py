@@ -9,7 +9,11 @@ from .const import (
     DOMAIN, 
     CONF_TRACKER_CONFIG,
     CONF_SOURCE_MODE,
-    MODE_CONST
+    MODE_CONST,
+    TRACKER_SUBNET,
+    TRACKER_GROUP,
+    GROUP_MODE_ALL,
+    GROUP_MODE_COUNT,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -39,7 +43,14 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
 
     device_trackers = []
     for target_id, info in tracker_config.items():
-        device_trackers.append(IKUAITracker(hass, target_id, info, coordinator))
+        if info.get("type") == TRACKER_SUBNET:
+            device_trackers.append(IKUAISubnetTracker(hass, target_id, info, coordinator))
+        elif info.get("type") == TRACKER_GROUP:
+            # 计数模式的分组由 sensor 平台创建
+            if info.get("mode") != GROUP_MODE_COUNT:
+                device_trackers.append(IKUAIGroupTracker(hass, target_id, info, coordinator))
+        else:
+            device_trackers.append(IKUAITracker(hass, target_id, info, coordinator))
     
     async_add_entities(device_trackers, False)
 
@@ -47,6 +58,8 @@ class IKUAITracker(ScannerEntity):
     """Define an iKuai device tracker entity."""
     
     _attr_has_entity_name = True
+    # coordinator.data 中该类追踪器所在的键
+    _data_key = "tracker"
 
     def __init__(self, hass, target_id, info, coordinator):
         """Initialize the tracker."""
@@ -65,7 +78,6 @@ class IKUAITracker(ScannerEntity):
         self._hass = hass        
         self._is_connected = False 
         self._attrs = {}
-        self._querytime = ""
 
         self._custom_name = self._info.get("name", self._target_id)
         
@@ -103,7 +115,8 @@ class IKUAITracker(ScannerEntity):
     @property
     def available(self):
         """Return if entity is available based on coordinator existence."""
-        return self.coordinator is not None
+        # 启动引导阶段还没有 LAN 主机表，此时无法判断在离
+        return self.coordinator is not None and (not self.coordinator.data or self._data_key in self.coordinator.data)
         
     @property
     def device_info(self):
@@ -126,12 +139,16 @@ class IKUAITracker(ScannerEntity):
         attrs = {}
         if self._attrs:
             attrs = self._attrs
+        if self.coordinator.stale:
+            attrs = {**attrs, "stale": True}
         return attrs       
 
     async def async_added_to_hass(self):
         """Handle entity which will be added."""
         self.async_on_remove(
-            self.coordinator.async_add_listener(self._handle_coordinator_update)
+            self.coordinator.async_add_entity_listener(
+                self._handle_coordinator_update, ((self._data_key, self._target_id),)
+            )
         )
         self._update_state()
 
@@ -149,27 +166,69 @@ class IKUAITracker(ScannerEntity):
         if not self.coordinator.data:
             return
 
-        listtracker = self.coordinator.data.get("tracker", [])
-        if self.coordinator.data.get("querytime"):
-            self._querytime = self.coordinator.data["querytime"]
-        
-        if isinstance(listtracker, list):
-            target_lower = str(self._target_id).lower()
-            
-            for tracker in listtracker:
-                matched = False
-                config_mac = self._info.get("mac_address", "").lower()
-                tracker_mac = tracker.get("mac", "").lower()
-                tracker_ip = tracker.get("ip_addr", "")
-                
-                if tracker_ip == self._target_id:
-                    matched = True
-                elif config_mac and tracker_mac == config_mac:
-                    matched = True
-                elif tracker_mac == target_lower:
-                    matched = True
-                
-                if matched:
-                    self._is_connected = True
-                    self._attrs = tracker
-                    break
+        trackers = self.coordinator.data.get("tracker")
+        tracker = trackers.get(self._target_id) if isinstance(trackers, dict) else None
+        if tracker:
+            self._is_connected = True
+            self._attrs = tracker
+
+
+class IKUAISubnetTracker(IKUAITracker):
+    """A whole CIDR subnet tracked as one entity.
+
+    Home while any LAN host is inside the subnet, kept home for the
+    tracker's buffer (or consider_home) after the last host left; the
+    occupancy count, capacity and the present hosts are attributes.
+    """
+
+    _data_key = "subnet"
+    _unrecorded_attributes = frozenset({"hosts"})
+
+    @property
+    def icon(self):
+        """Return the icon."""
+        return "mdi:lan"
+
+    def _update_state(self):
+        """Update the occupancy from coordinator data."""
+        self._is_connected = False
+        self._attrs = {}
+
+        if not self.coordinator.data:
+            return
+
+        subnets = self.coordinator.data.get("subnet")
+        subnet = subnets.get(self._target_id) if isinstance(subnets, dict) else None
+        if subnet:
+            self._is_connected = subnet.get("home", subnet["count"] > 0)
+            self._attrs = {"subnet": self._target_id, **subnet}
+
+
+class IKUAIGroupTracker(IKUAITracker):
+    """A group of devices tracked as one entity.
+
+    Home while any (or, in "all" mode, every) member is home; the member
+    count and the members at home are exposed as attributes.
+    """
+
+    _data_key = "group"
+    _unrecorded_attributes = frozenset({"members_home"})
+
+    @property
+    def icon(self):
+        """Return the icon."""
+        return "mdi:account-group"
+
+    def _update_state(self):
+        """Update the group presence from coordinator data."""
+        self._is_connected = False
+        self._attrs = {}
+
+        if not self.coordinator.data:
+            return
+
+        groups = self.coordinator.data.get("group")
+        group = groups.get(self._target_id) if isinstance(groups, dict) else None
+        if group:
+            self._is_connected = group["all"] if self._info.get("mode") == GROUP_MODE_ALL else group["any"]
+            self._attrs = {"mode": self._info.get("mode"), **group}
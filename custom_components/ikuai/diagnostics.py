@@ -0,0 +1,25 @@
+"""Diagnostics support for iKuai."""
+from __future__ import annotations
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, COORDINATOR, CONF_USERNAME, CONF_PASSWD, CONF_PASS
+
+TO_REDACT = {CONF_USERNAME, CONF_PASSWD, CONF_PASS}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Return diagnostics for a config entry."""
+    coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "options": async_redact_data(dict(entry.options), TO_REDACT),
+        "update_interval": coordinator.update_interval.total_seconds() if coordinator.update_interval else None,
+        "last_update_success": coordinator.last_update_success,
+        "breaker": coordinator.breaker_state,
+        "connections": coordinator.connection_stats,
+        "writes_avoided": coordinator.writes_avoided,
+        "requests": coordinator.request_metrics,
+    }
@@ -0,0 +1,110 @@
+"""Per-endpoint request instrumentation for the iKuai integration."""
+
+# 延迟直方图分桶上限（秒），最后一个桶收集更慢的请求
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def endpoint_key(json_body):
+    """Return the name a request body is accounted under, e.g. ``ipv6/data,total``."""
+    if not isinstance(json_body, dict) or "func_name" not in json_body:
+        return "login"
+    param = json_body.get("param")
+    if json_body.get("action") == "show" and isinstance(param, dict) and param.get("TYPE"):
+        return f"{json_body['func_name']}/{param['TYPE']}"
+    return f"{json_body['func_name']}/{json_body.get('action', '')}"
+
+
+class EndpointStats:
+    """Counters for one endpoint."""
+
+    def __init__(self):
+        """Initialize empty counters."""
+        self.requests = 0
+        self.errors = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.bytes_total = 0
+        self.bytes_last = 0
+        self.decode_total = 0.0
+
+    def record(self, latency, size, decode, error):
+        """Account one request."""
+        self.requests += 1
+        if error:
+            self.errors += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                break
+        else:
+            index = len(LATENCY_BUCKETS)
+        self.histogram[index] += 1
+        if size:
+            self.bytes_total += size
+            self.bytes_last = size
+        self.decode_total += decode
+
+    def as_dict(self):
+        """Return the counters in a JSON friendly form."""
+        ok = max(self.requests, 1)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_avg_ms": round(self.latency_total / ok * 1000, 1),
+            "latency_max_ms": round(self.latency_max * 1000, 1),
+            "latency_histogram": {
+                **{f"<={bound}s": count for bound, count in zip(LATENCY_BUCKETS, self.histogram)},
+                f">{LATENCY_BUCKETS[-1]}s": self.histogram[-1],
+            },
+            "bytes_total": self.bytes_total,
+            "bytes_last": self.bytes_last,
+            "decode_avg_ms": round(self.decode_total / ok * 1000, 2),
+        }
+
+
+class RequestMetrics:
+    """Latency, payload size, decode time and error counters per endpoint."""
+
+    def __init__(self):
+        """Initialize the collector."""
+        self.endpoints = {}
+        # 仅在轮询周期内累计；周期之外的请求（定向刷新、选项流程）不计入
+        self._cycle = None
+
+    def record(self, json_body, latency, size=0, decode=0.0, error=False):
+        """Account one request against its endpoint."""
+        key = endpoint_key(json_body)
+        stats = self.endpoints.get(key)
+        if stats is None:
+            stats = self.endpoints[key] = EndpointStats()
+        stats.record(latency, size, decode, error)
+        if self._cycle is not None:
+            cycle = self._cycle.setdefault(key, [0, 0.0])
+            cycle[0] += 1
+            cycle[1] += latency
+
+    def start_cycle(self):
+        """Start collecting the latencies of a poll cycle."""
+        self._cycle = {}
+
+    def end_cycle(self):
+        """Stop collecting and return (average ms, {endpoint: average ms}) of the cycle."""
+        cycle, self._cycle = self._cycle or {}, None
+        count = sum(item[0] for item in cycle.values())
+        if not count:
+            return None, {}
+        total = sum(item[1] for item in cycle.values())
+        return round(total / count * 1000, 1), {
+            key: round(latency / requests * 1000, 1) for key, (requests, latency) in cycle.items()
+        }
+
+    def errors(self):
+        """Return (total errors, {endpoint: errors}) since startup."""
+        per_endpoint = {key: stats.errors for key, stats in self.endpoints.items() if stats.errors}
+        return sum(per_endpoint.values()), per_endpoint
+
+    def as_dict(self):
+        """Return all endpoint counters in a JSON friendly form."""
+        return {key: stats.as_dict() for key, stats in sorted(self.endpoints.items())}
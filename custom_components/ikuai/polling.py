@@ -0,0 +1,138 @@
+"""Adaptive polling interval, circuit breaker and retry policy for the iKuai integration."""
+import asyncio
+import random
+import time
+
+from .const import RETRY_STRATEGY
+
+# 路由器负载高时拉长间隔，流量变化剧烈时缩短间隔
+CPU_HIGH = 80
+LATENCY_HIGH = 2.0
+TRAFFIC_CHANGE_FAST = 0.5
+# MB/s，低于该流量时的抖动不算剧烈变化
+TRAFFIC_FLOOR = 1.0
+BACKOFF_FACTOR = 1.5
+SPEEDUP_FACTOR = 0.5
+RELAX_FACTOR = 0.5
+
+
+class AdaptiveInterval:
+    """Derive the next poll interval from router load and traffic."""
+
+    def __init__(self, base, minimum, maximum):
+        """Initialize with the configured interval and its bounds (seconds)."""
+        self.base = base
+        self.minimum = min(minimum, base)
+        self.maximum = max(maximum, base)
+        self.current = base
+        self._last_traffic = None
+
+    def update(self, cpu, latency, traffic):
+        """Return the next interval for one completed poll.
+
+        ``cpu`` is the router CPU load in percent, ``latency`` the cycle wall
+        time in seconds and ``traffic`` the current upload + download rate.
+        """
+        last_traffic, self._last_traffic = self._last_traffic, traffic
+        if cpu >= CPU_HIGH or latency >= LATENCY_HIGH:
+            target = self.current * BACKOFF_FACTOR
+        elif last_traffic is not None and abs(traffic - last_traffic) > TRAFFIC_CHANGE_FAST * max(last_traffic, traffic, TRAFFIC_FLOOR):
+            target = self.current * SPEEDUP_FACTOR
+        else:
+            # 平稳时逐步回到配置的间隔
+            target = self.current + (self.base - self.current) * RELAX_FACTOR
+        self.current = round(min(self.maximum, max(self.minimum, target)), 1)
+        return self.current
+
+
+class CircuitBreaker:
+    """Stop hammering an unreachable router.
+
+    After ``threshold`` consecutive network failures the breaker opens and
+    every request is refused locally.  Once the backoff has elapsed a single
+    request is let through as a probe; success closes the breaker, failure
+    re-opens it with a doubled (jittered) backoff.  A probe that ends
+    without either (cancelled, unexpected error) must be handed back with
+    ``release_probe`` so the breaker does not stay half open.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold, base_backoff, max_backoff):
+        """Initialize the breaker."""
+        self.threshold = threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.state = self.CLOSED
+        self.failures = 0
+        self.backoff = base_backoff
+        self.next_probe = 0
+
+    def allow_request(self, now=None):
+        """Return True if a request may be sent now."""
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic() if now is None else now
+        if self.state == self.OPEN and now >= self.next_probe:
+            # 放行一个探测请求，其余请求继续被拒绝
+            self.state = self.HALF_OPEN
+            return True
+        return False
+
+    def retry_in(self, now=None):
+        """Return seconds until the next probe is allowed."""
+        if self.state != self.OPEN:
+            return 0
+        now = time.monotonic() if now is None else now
+        return max(0, self.next_probe - now)
+
+    def record_success(self):
+        """Record a request that reached the router; returns True if it closed the breaker."""
+        self.failures = 0
+        if self.state == self.CLOSED:
+            return False
+        self.state = self.CLOSED
+        self.backoff = self.base_backoff
+        return True
+
+    def release_probe(self, now=None):
+        """Re-open the breaker with the current backoff if a probe never finished."""
+        if self.state != self.HALF_OPEN:
+            return
+        now = time.monotonic() if now is None else now
+        self.state = self.OPEN
+        self.next_probe = now + self.backoff * random.uniform(0.8, 1.2)
+
+    def record_failure(self, now=None):
+        """Record a network failure; returns True if it opened the breaker."""
+        now = time.monotonic() if now is None else now
+        self.failures += 1
+        if self.state == self.HALF_OPEN:
+            self.backoff = min(self.max_backoff, self.backoff * 2)
+        elif self.state == self.CLOSED and self.failures >= self.threshold:
+            self.backoff = self.base_backoff
+        else:
+            return False
+        opened = self.state == self.CLOSED
+        self.state = self.OPEN
+        self.next_probe = now + self.backoff * random.uniform(0.8, 1.2)
+        return opened
+
+
+async def async_retry(attempt, strategy=RETRY_STRATEGY):
+    """Await ``attempt()`` once per (timeout, wait) step until it returns something other than None.
+
+    Returns None if every step timed out or came back empty.
+    """
+    for index, (timeout_seconds, wait_seconds) in enumerate(strategy):
+        try:
+            result = await asyncio.wait_for(attempt(), timeout_seconds)
+            if result is not None:
+                return result
+        except asyncio.TimeoutError:
+            pass
+        if wait_seconds and index < len(strategy) - 1:
+            await asyncio.sleep(wait_seconds)
+    return None
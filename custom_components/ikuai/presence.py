@@ -0,0 +1,90 @@
+"""Timestamp based presence tracking for iKuai device trackers."""
+import time
+
+
+class PresenceEngine:
+    """Decide home/away per target from when it was last seen.
+
+    A target stays home for ``consider_home`` seconds after it was last seen
+    in the LAN host table, no matter how often the table is polled.  Only
+    the last-seen timestamp is kept per target, plus the last record of
+    targets that are currently home so their attributes survive the grace
+    period.
+    """
+
+    def __init__(self, consider_home):
+        """Initialize with {target_id: consider_home seconds}."""
+        self._consider_home = consider_home
+        self._last_seen = {}
+        self._records = {}
+        self._primed = False
+
+    def update(self, found, now=None):
+        """Apply one host table scan.
+
+        ``found`` maps target_id to the host record for every target seen in
+        this scan.  Returns ({target_id: record} for targets considered home,
+        [(target_id, is_home)] for targets whose presence changed).
+        """
+        now = time.monotonic() if now is None else now
+        transitions = []
+        for target_id, consider_home in self._consider_home.items():
+            was_home = target_id in self._records
+            record = found.get(target_id)
+            if record is not None:
+                self._last_seen[target_id] = now
+                self._records[target_id] = record
+            elif was_home and now - self._last_seen[target_id] > consider_home:
+                del self._records[target_id]
+
+            is_home = target_id in self._records
+            # 首次扫描只建立初始状态，不产生事件
+            if self._primed and is_home != was_home:
+                transitions.append((target_id, is_home))
+        self._primed = True
+        return dict(self._records), transitions
+
+    def last_seen(self, target_id):
+        """Return the monotonic time a target was last seen, or None."""
+        return self._last_seen.get(target_id)
+
+
+# 分组属性中最多列出的在线成员数
+GROUP_MAX_MEMBERS = 100
+
+
+class GroupPresence:
+    """Aggregate the presence of many devices into a few group states.
+
+    Every member gets the same last-seen debounce as a single tracker, but
+    no per-member entity or event; one scan yields, per group, the number
+    of members home plus a compact {member: hostname} map of who they are.
+    """
+
+    def __init__(self, groups, consider_home):
+        """Initialize from {group_id: [(index type, key)]} and {member: consider_home}."""
+        self._groups = groups
+        self._members = list(consider_home)
+        self._engine = PresenceEngine(consider_home)
+
+    def update(self, all_lan_devices, now=None):
+        """Return {group_id: aggregated state} for one LAN host table scan."""
+        found = {}
+        for member in self._members:
+            record = all_lan_devices[member[0]].get(member[1])
+            if record:
+                found[member] = record.get("hostname") or member[1]
+        home, _ = self._engine.update(found, now)
+
+        result = {}
+        for group_id, members in self._groups.items():
+            present = [member for member in members if member in home]
+            result[group_id] = {
+                "count": len(present),
+                "total": len(members),
+                "any": bool(present),
+                "all": bool(members) and len(present) == len(members),
+                "members_home": {member[1]: home[member] for member in present[:GROUP_MAX_MEMBERS]},
+                "members_home_truncated": len(present) > GROUP_MAX_MEMBERS,
+            }
+        return result
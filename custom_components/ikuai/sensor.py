@@ -1,9 +1,14 @@
 """IKUAI Entities"""
 import logging
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.const import EntityCategory
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.helpers.device_registry import DeviceEntryType
 
-from .const import COORDINATOR, DOMAIN, SENSOR_TYPES
+from .const import (
+    COORDINATOR, DOMAIN, SENSOR_TYPES, SENSOR_UNRECORDED_ATTRIBUTES,
+    CONF_TRACKER_CONFIG, CONF_SOURCE_MODE, MODE_CONST, TRACKER_GROUP, GROUP_MODE_COUNT,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -15,18 +20,33 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
     for sensor in SENSOR_TYPES:
         sensors.append(IKUAISensor(sensor, coordinator))
 
+    # 计数模式的设备分组：状态为组内在线设备数
+    if config_entry.data.get(CONF_SOURCE_MODE) != MODE_CONST:
+        for target_id, info in config_entry.data.get(CONF_TRACKER_CONFIG, {}).items():
+            if info.get("type") == TRACKER_GROUP and info.get("mode") == GROUP_MODE_COUNT:
+                sensors.append(IKUAIGroupSensor(target_id, info, coordinator))
+
     async_add_entities(sensors, False)
 
-class IKUAISensor(CoordinatorEntity):
+class IKUAISensor(CoordinatorEntity, SensorEntity):
     """Define an iKuai sensor entity."""
     
     _attr_has_entity_name = True
+    _unrecorded_attributes = frozenset(SENSOR_UNRECORDED_ATTRIBUTES)
 
     def __init__(self, kind, coordinator):
         """Initialize the sensor."""
         super().__init__(coordinator)
         self.kind = kind
         self.coordinator = coordinator
+        self._attr_native_unit_of_measurement = SENSOR_TYPES[kind].get("unit_of_measurement")
+        self._attr_device_class = SENSOR_TYPES[kind].get("device_class")
+        # SENSOR_TYPES 中保存字符串，转换为 HA 的枚举
+        state_class = SENSOR_TYPES[kind].get("state_class")
+        self._attr_state_class = SensorStateClass(state_class) if state_class else None
+        entity_category = SENSOR_TYPES[kind].get("entity_category")
+        self._attr_entity_category = EntityCategory(entity_category) if entity_category else None
+        self._attr_entity_registry_enabled_default = SENSOR_TYPES[kind].get("enabled_default", True)
 
     @property
     def name(self):
@@ -61,11 +81,15 @@ class IKUAISensor(CoordinatorEntity):
         return self.coordinator.last_update_success
 
     @property
-    def state(self):
+    def native_value(self):
         """Return the state of the sensor."""
         if self.coordinator.data is None:
             return None
-        return self.coordinator.data.get(self.kind)
+        value = self.coordinator.data.get(self.kind)
+        # 空字符串对数值型/时间戳传感器无效
+        if value == "" and (self._attr_state_class or self._attr_device_class):
+            return None
+        return value
 
     @property
     def icon(self):
@@ -73,37 +97,84 @@ class IKUAISensor(CoordinatorEntity):
         return SENSOR_TYPES[self.kind]["icon"]
         
     @property
-    def unit_of_measurement(self):
-        """Return the unit of measurement."""
-        if SENSOR_TYPES[self.kind].get("unit_of_measurement"):
-            return SENSOR_TYPES[self.kind]["unit_of_measurement"]
-        
-    @property
-    def device_class(self):
-        """Return the device class."""
-        if SENSOR_TYPES[self.kind].get("device_class"):
-            return SENSOR_TYPES[self.kind]["device_class"]
-        
-    @property
-    def state_attributes(self): 
+    def extra_state_attributes(self): 
         """Return the state attributes."""
-        attrs = {}
         data = self.coordinator.data
-        if data and data.get(self.kind + "_attrs"):
-            attrs = data[self.kind + "_attrs"]
-
-        if data and "querytime" in data:
-            attrs["querytime"] = data["querytime"]
-        else:
-            attrs["querytime"] = "Unknown"
-            
-        return attrs
+        attrs = data.get(self.kind + "_attrs") if data else None
+        if self.coordinator.stale:
+            return {**(attrs or {}), "stale": True}
+        return attrs or None
 
     async def async_added_to_hass(self):
         """Handle entity which will be added."""
         self.async_on_remove(
-            self.coordinator.async_add_listener(self.async_write_ha_state)
+            self.coordinator.async_add_entity_listener(
+                self.async_write_ha_state, (self.kind, self.kind + "_attrs")
+            )
         )
     async def async_update(self):
         """Update entity."""
         #await self.coordinator.async_request_refresh()
+
+
+class IKUAIGroupSensor(CoordinatorEntity, SensorEntity):
+    """Number of devices of a tracker group that are home."""
+
+    _attr_has_entity_name = True
+    _attr_icon = "mdi:account-group"
+    _attr_native_unit_of_measurement = "个"
+    _attr_state_class = "measurement"
+    _unrecorded_attributes = frozenset({"members_home"})
+
+    def __init__(self, target_id, info, coordinator):
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._target_id = target_id
+        self._attr_name = info.get("name", target_id)
+        self._attr_unique_id = f"{DOMAIN}_{target_id}_{coordinator.host}"
+
+    @property
+    def device_info(self):
+        """Return device information."""
+        data = self.coordinator.data if self.coordinator.data else {}
+        return {
+            "identifiers": {(DOMAIN, self.coordinator.host)},
+            "name": data.get("device_name", "iKuai Router"),
+            "manufacturer": "iKuai",
+            "model": "iKuai Router",
+            "sw_version": data.get("sw_version", "Unknown"),
+        }
+
+    def _group(self):
+        groups = self.coordinator.data.get("group") if self.coordinator.data else None
+        return groups.get(self._target_id) if isinstance(groups, dict) else None
+
+    @property
+    def available(self):
+        """Return True once the group has been computed."""
+        return self.coordinator.last_update_success and self._group() is not None
+
+    @property
+    def native_value(self):
+        """Return the number of members at home."""
+        group = self._group()
+        return group["count"] if group else None
+
+    @property
+    def extra_state_attributes(self):
+        """Return the group size and the members at home."""
+        group = self._group()
+        if not group:
+            return None
+        attrs = {key: value for key, value in group.items() if key != "count"}
+        if self.coordinator.stale:
+            attrs["stale"] = True
+        return attrs
+
+    async def async_added_to_hass(self):
+        """Handle entity which will be added."""
+        self.async_on_remove(
+            self.coordinator.async_add_entity_listener(
+                self.async_write_ha_state, (("group", self._target_id),)
+            )
+        )
@@ -0,0 +1,148 @@
+"""Login session handling for the iKuai coordinator."""
+import asyncio
+import logging
+import time
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    SESSION_LIFETIME,
+    SESSION_RENEW_BEFORE,
+    SESSION_STORAGE_VERSION,
+    RESULT_BAD_AUTH,
+    RESULT_SESSION_EXPIRED,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def session_expired(result):
+    """Return True if a fetcher result means the sess_key is no longer valid."""
+    if result == 401:
+        return True
+    return isinstance(result, dict) and RESULT_SESSION_EXPIRED in (result.get("Result"), result.get("code"))
+
+
+def _session_store(hass, storage_key):
+    return Store(hass, SESSION_STORAGE_VERSION, f"{DOMAIN}.{storage_key}")
+
+
+async def async_remove_session(hass, storage_key):
+    """Delete a persisted sess_key, e.g. when its config entry is removed."""
+    await _session_store(hass, storage_key).async_remove()
+
+
+class SessionManager:
+    """Hand out the router sess_key.
+
+    Concurrent callers share a single login, the key is renewed in the
+    background shortly before it expires and persisted so a restart can
+    reuse it.  ``async_call`` retries a request once after a transparent
+    re-login when the router reports the session expired.
+    """
+
+    def __init__(self, hass, fetcher, storage_key, lifetime=SESSION_LIFETIME, renew_before=SESSION_RENEW_BEFORE):
+        """Initialize the session manager."""
+        self._hass = hass
+        self._fetcher = fetcher
+        self._store = _session_store(hass, storage_key)
+        self._lifetime = lifetime
+        self._renew_before = renew_before
+        self._login_task = None
+        self._cancel_renewal = None
+        self.sess_key = None
+        # 墙上时间，便于跨重启判断是否过期
+        self.expires = 0
+        self.auth_failed = False
+        self.logins = 0
+
+    @property
+    def valid(self):
+        """Return True if the current key has not expired."""
+        return self.sess_key is not None and time.time() < self.expires
+
+    async def async_load(self):
+        """Restore a persisted key that is still valid."""
+        data = await self._store.async_load()
+        if data and data.get("sess_key") and data.get("expires", 0) > time.time():
+            self.sess_key = data["sess_key"]
+            self.expires = data["expires"]
+            self._schedule_renewal()
+            _LOGGER.debug("Reusing stored iKuai session, valid for %.0fs", self.expires - time.time())
+
+    async def async_get(self):
+        """Return a valid sess_key, logging in if needed (None on failure)."""
+        if self.valid:
+            return self.sess_key
+        return await self._async_login()
+
+    def invalidate(self, sess_key):
+        """Forget ``sess_key`` after the router rejected it."""
+        # 其他调用方可能已经换了新 key，只作废被拒绝的那个
+        if sess_key is not None and sess_key == self.sess_key:
+            self.sess_key = None
+            self.expires = 0
+
+    async def async_call(self, request):
+        """Run ``request(sess_key)``, re-logging in and retrying once if the session expired."""
+        sess_key = await self.async_get()
+        if not sess_key:
+            return None
+        result = await request(sess_key)
+        if not session_expired(result):
+            return result
+        _LOGGER.debug("iKuai session expired, logging in again")
+        self.invalidate(sess_key)
+        sess_key = await self.async_get()
+        if not sess_key:
+            return None
+        return await request(sess_key)
+
+    async def _async_login(self):
+        if self.auth_failed:
+            _LOGGER.error("The username or password has been incorrect, please reconfigure the ikuai integration.")
+            return None
+        if self._login_task is None:
+            self._login_task = self._hass.async_create_task(self._async_do_login())
+        # 单飞：并发调用方共享同一次登录，调用方被取消不影响登录本身
+        return await asyncio.shield(self._login_task)
+
+    async def _async_do_login(self):
+        try:
+            result = await self._fetcher._login_ikuai()
+            self.logins += 1
+            if result == RESULT_BAD_AUTH:
+                self.auth_failed = True
+                _LOGGER.error("iKuai rejected the username or password, please reconfigure the ikuai integration.")
+                return None
+            if not isinstance(result, str):
+                return None
+            self.sess_key = result
+            self.expires = time.time() + self._lifetime
+            self._schedule_renewal()
+            await self._store.async_save({"sess_key": self.sess_key, "expires": self.expires})
+            return self.sess_key
+        finally:
+            self._login_task = None
+
+    def _schedule_renewal(self):
+        if self._cancel_renewal is not None:
+            self._cancel_renewal()
+        delay = max(0, self.expires - self._renew_before - time.time())
+        self._cancel_renewal = async_call_later(self._hass, delay, self._renew)
+
+    @callback
+    def _renew(self, _now):
+        self._cancel_renewal = None
+        if self._login_task is None and not self.auth_failed:
+            _LOGGER.debug("Renewing iKuai session ahead of expiry")
+            self._login_task = self._hass.async_create_task(self._async_do_login())
+
+    async def async_close(self):
+        """Stop background renewal."""
+        if self._cancel_renewal is not None:
+            self._cancel_renewal()
+            self._cancel_renewal = None
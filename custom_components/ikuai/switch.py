@@ -1,12 +1,17 @@
 """IKUAI Entities"""
 import logging
 import asyncio
+import time
 
 from homeassistant.components.switch import (
     SwitchEntity,
 )
+from homeassistant.core import callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.event import async_call_later
 from .const import (
-    COORDINATOR, DOMAIN, CONF_HOST, CONF_USERNAME, CONF_PASSWD, CONF_PASS, SWITCH_TYPES, CONF_CUSTOM_SWITCHES
+    COORDINATOR, DOMAIN, CONF_HOST, CONF_USERNAME, CONF_PASSWD, CONF_PASS, SWITCH_TYPES, CONF_CUSTOM_SWITCHES,
+    SECTION_SWITCH, SECTION_MAC_CONTROL, MAC_CONTROL_SYNC_INTERVAL
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -28,17 +33,90 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
             switchs.append(IKUAISwitch(hass, switch_key, coordinator, is_custom=True, custom_config=switch_config))
             _LOGGER.debug(switch_config["name"])
 
-    if coordinator.data.get("mac_control"):
-        listmacdata = coordinator.data.get("mac_control")
-        if isinstance(listmacdata, list):
-            for mac in listmacdata:
-                switchs.append(IKUAISwitchmac(hass, coordinator, mac["id"]))
-    
     async_add_entities(switchs, False)
 
+    # MAC 控制开关随路由器 ACL 列表增删，启动引导阶段还没有 ACL 列表时等首次完整抓取
+    known = {}
+    sync_handle = None
+    last_sync = None
+
+    @callback
+    def _sync_mac_switches(_now=None):
+        nonlocal sync_handle, last_sync
+        sync_handle = None
+        mac_control = coordinator.data.get("mac_control") if coordinator.data else None
+        if not isinstance(mac_control, dict):
+            return
+        registry = er.async_get(hass)
+        if last_sync is None:
+            # 首次同步：清理 HA 停止期间在路由器上被删除的规则留下的实体
+            current = {IKUAISwitchmac.unique_id_for(coordinator.host, rule.get("mac")) for rule in mac_control.values()}
+            prefix = IKUAISwitchmac.unique_id_for(coordinator.host, "")
+            for entry in er.async_entries_for_config_entry(registry, config_entry.entry_id):
+                if entry.domain == "switch" and entry.unique_id.startswith(prefix) and entry.unique_id not in current:
+                    _LOGGER.debug("Removing MAC control switch %s, rule no longer on the router", entry.entity_id)
+                    registry.async_remove(entry.entity_id)
+        last_sync = time.monotonic()
+
+        freed = set()
+        for macid in known.keys() - mac_control.keys():
+            entity = known.pop(macid)
+            if entity is None:
+                continue
+            _LOGGER.debug("MAC control rule %s removed on the router, removing %s", macid, entity.entity_id)
+            freed.add(entity.unique_id)
+            if entity.entity_id and registry.async_get(entity.entity_id):
+                registry.async_remove(entity.entity_id)
+            else:
+                hass.async_create_task(entity.async_remove(force_remove=True))
+
+        # unique_id 按 MAC 生成：同一 MAC 的多条规则只建一个开关，其余记为 None，
+        # 刚被删除的实体要等下一次同步才让出其 unique_id
+        claimed = {entity.unique_id for entity in known.values() if entity is not None} | freed
+        added = []
+        for macid in sorted(mac_control.keys()):
+            if known.get(macid) is not None:
+                continue
+            unique_id = IKUAISwitchmac.unique_id_for(coordinator.host, mac_control[macid].get("mac"))
+            if unique_id in claimed:
+                if macid not in known:
+                    _LOGGER.debug("MAC control rule %s shares its MAC with another rule, no switch created", macid)
+                known[macid] = None
+                continue
+            claimed.add(unique_id)
+            known[macid] = IKUAISwitchmac(hass, coordinator, macid)
+            added.append(known[macid])
+        if added:
+            async_add_entities(added, False)
+
+    @callback
+    def _on_coordinator_update():
+        nonlocal sync_handle
+        mac_control = coordinator.data.get("mac_control") if coordinator.data else None
+        if not isinstance(mac_control, dict) or mac_control.keys() == known.keys() or sync_handle is not None:
+            return
+        # 限制同步频率，规则批量变动时合并为一次增删
+        delay = 0 if last_sync is None else MAC_CONTROL_SYNC_INTERVAL - (time.monotonic() - last_sync)
+        if delay <= 0:
+            _sync_mac_switches()
+        else:
+            sync_handle = async_call_later(hass, delay, _sync_mac_switches)
+
+    @callback
+    def _cancel_sync():
+        if sync_handle is not None:
+            sync_handle()
+
+    _on_coordinator_update()
+    config_entry.async_on_unload(coordinator.async_add_listener(_on_coordinator_update))
+    config_entry.async_on_unload(_cancel_sync)
+
 class IKUAIBaseSwitch(SwitchEntity):
     """Base class for iKuai switches."""
     _attr_has_entity_name = True
+    _attr_should_poll = False
+    # 仅当这些数据键变化时才写入状态
+    _coordinator_keys = ()
 
     def __init__(self, hass, coordinator):
         """Initialize the base switch."""
@@ -56,11 +134,24 @@ class IKUAIBaseSwitch(SwitchEntity):
     async def async_added_to_hass(self):
         """Handle entity which will be added."""
         self.async_on_remove(
-            self.coordinator.async_add_listener(self.async_write_ha_state)
+            self.coordinator.async_add_entity_listener(
+                self._handle_coordinator_update, self._coordinator_keys
+            )
         )
 
+    @property
+    def extra_state_attributes(self):
+        """Flag states restored from the last snapshot."""
+        return {"stale": True} if self.coordinator.stale else None
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Handle updated data from the coordinator."""
+        self.async_write_ha_state()
+
 class IKUAISwitch(IKUAIBaseSwitch):
     """Define a static iKuai switch entity."""
+    _coordinator_keys = ("switch",)
 
     def __init__(self, hass, kind, coordinator,is_custom=False, custom_config=None):
         """Initialize the switch."""
@@ -98,21 +189,32 @@ class IKUAISwitch(IKUAIBaseSwitch):
     @property
     def is_on(self):
         """Return true if switch is on based on coordinator data."""
-        if self.coordinator.data.get("switch"):
-            for item in self.coordinator.data["switch"]:
-                if item['name'] == self._name:
-                    return item['onoff'] == "on"
+        switches = self.coordinator.data.get("switch") if self.coordinator.data else None
+        # 尚未抓取过开关状态时显示为未知
+        if switches is None:
+            return None
+        for item in switches:
+            if item['name'] == self._name:
+                return item['onoff'] == "on"
         return False
 
     async def async_turn_on(self, **kwargs):
         """Turn the switch on."""
-        await self.coordinator.async_control_device(self._turn_on_body)
-        await self.coordinator.async_request_refresh()
+        await self._async_set(self._turn_on_body, "on")
 
     async def async_turn_off(self, **kwargs):
         """Turn the switch off."""
-        await self.coordinator.async_control_device(self._turn_off_body)
-        await self.coordinator.async_request_refresh()
+        await self._async_set(self._turn_off_body, "off")
+
+    async def _async_set(self, action_body, onoff):
+        """Send the action, show the new state at once and re-read only this switch."""
+        switches = self.coordinator.data.get("switch") if self.coordinator.data else None
+        optimistic = None
+        if isinstance(switches, list):
+            optimistic = {"switch": [
+                {**item, "onoff": onoff} if item["name"] == self._name else item for item in switches
+            ]}
+        await self.coordinator.async_control_section(action_body, SECTION_SWITCH, optimistic, self._name)
 
 class IKUAISwitchmac(IKUAIBaseSwitch):
     """Define an iKuai MAC access control switch entity."""
@@ -121,36 +223,43 @@ class IKUAISwitchmac(IKUAIBaseSwitch):
         """Initialize the MAC control switch."""
         super().__init__(hass, coordinator)      
         self._macid = macid
+        self._coordinator_keys = (("mac_control", macid),)
         self._attr_icon = "mdi:network-pos"
         self._attr_device_class = "switch"
         self._update_from_coordinator()
+        # 固定为创建时的 MAC，路由器上修改规则的 MAC 不会改变实体的 unique_id
+        self._attr_unique_id = self.unique_id_for(coordinator.host, self._mac_address)
         
     def _update_from_coordinator(self):
         """Update the internal state from coordinator data."""
-        listmacswitch = self.coordinator.data.get("mac_control")
-        if isinstance(listmacswitch, list):
-            for macswitch in listmacswitch:
-                if macswitch["id"] == self._macid:
-                    self._mac_address = macswitch["mac"]
-                    self._mac = str(self._mac_address).replace(":","")
-                    
-                    if macswitch.get("comment"):
-                        self._name = f"Mac_control_{self._mac[-6:]}({macswitch['comment']})"
-                    else:
-                        self._name = f"Mac_control_{self._mac[-6:]}(未备注)"
-                    
-                    self._is_on = macswitch["enabled"] == "yes"
-                    break
+        mac_control = self.coordinator.data.get("mac_control")
+        macswitch = mac_control.get(self._macid) if isinstance(mac_control, dict) else None
+        if macswitch:
+            self._mac_address = macswitch["mac"]
+            self._mac = str(self._mac_address).replace(":","")
+            
+            if macswitch.get("comment"):
+                self._name = f"Mac_control_{self._mac[-6:]}({macswitch['comment']})"
+            else:
+                self._name = f"Mac_control_{self._mac[-6:]}(未备注)"
+            
+            self._is_on = macswitch["enabled"] == "yes"
 
     @property
     def name(self):
         """Return the name of the switch."""
         return self._name
 
+    @staticmethod
+    def unique_id_for(host, mac):
+        """Return the unique ID of the switch for a rule's MAC address."""
+        return f"{DOMAIN}_switch_{host}_{str(mac).replace(':', '')}"
+
     @property
-    def unique_id(self):
-        """Return a unique ID for this entity."""
-        return f"{DOMAIN}_switch_{self.coordinator.host}_{self._mac}"
+    def available(self):
+        """Return False once the rule is gone from the router's ACL list."""
+        mac_control = self.coordinator.data.get("mac_control") if self.coordinator.data else None
+        return isinstance(mac_control, dict) and self._macid in mac_control
 
     @property
     def is_on(self):
@@ -160,21 +269,36 @@ class IKUAISwitchmac(IKUAIBaseSwitch):
     @property
     def extra_state_attributes(self):
         """Return the state attributes."""
-        return {
+        attrs = {
             "mac_address": getattr(self, "_mac_address", None)
         }
+        if self.coordinator.stale:
+            attrs["stale"] = True
+        return attrs
 
     async def async_turn_on(self, **kwargs):
         """Turn the MAC control switch on."""
         mac_json_body = {"func_name":"acl_mac","action":"up","param":{"id":str(self._macid)}}
-        await self.coordinator.async_control_device(mac_json_body) 
-        await self.coordinator.async_request_refresh()
+        await self._async_set(mac_json_body, "yes")
 
     async def async_turn_off(self, **kwargs):
         """Turn the MAC control switch off."""
         mac_json_body = {"func_name":"acl_mac","action":"down","param":{"id":str(self._macid)}}
-        await self.coordinator.async_control_device(mac_json_body)
-        await self.coordinator.async_request_refresh()
+        await self._async_set(mac_json_body, "no")
+
+    async def _async_set(self, action_body, enabled):
+        """Send the action, show the new state at once and re-read only the ACL list."""
+        mac_control = self.coordinator.data.get("mac_control") if self.coordinator.data else None
+        optimistic = None
+        if isinstance(mac_control, dict) and self._macid in mac_control:
+            optimistic = {"mac_control": {**mac_control, self._macid: {**mac_control[self._macid], "enabled": enabled}}}
+        await self.coordinator.async_control_section(action_body, SECTION_MAC_CONTROL, optimistic)
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Refresh the rule from coordinator data before writing state."""
+        self._update_from_coordinator()
+        self.async_write_ha_state()
 
     async def async_update(self):
         """Update the entity state."""